@@ -2,7 +2,6 @@
 Example: Basic VLM-based web navigation
 """
 
-import asyncio
 import sys
 from pathlib import Path
 
@@ -10,7 +9,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.navigation import NavigationAgent
-from src.utils import setup_directories, validate_api_keys
+from src.utils import setup_directories, validate_api_keys, run_async
 
 
 async def main():
@@ -74,4 +73,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -2,7 +2,6 @@
 Example: Run a benchmark duel between VLM and DOM crawlers
 """
 
-import asyncio
 import sys
 from pathlib import Path
 
@@ -10,7 +9,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.benchmarking import BenchmarkRunner
-from src.utils import setup_directories, validate_api_keys
+from src.utils import setup_directories, validate_api_keys, run_async
 
 
 async def main():
@@ -52,8 +51,9 @@ async def main():
     )
     
     try:
-        # Run the duel
-        results = await runner.run_duel(url, goal, selectors)
+        # Run the duel with a shared browser
+        async with runner:
+            results = await runner.run_duel(url, goal, selectors)
         
         # Results are automatically printed by the runner
         print("\n✅ Duel complete! Results saved to benchmarks/")
@@ -71,4 +71,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
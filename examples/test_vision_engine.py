@@ -31,7 +31,7 @@ def main():
     
     # Check if there are any screenshots
     screenshots_dir = Path("screenshots")
-    screenshots = list(screenshots_dir.glob("*.png"))
+    screenshots = [*screenshots_dir.glob("*.jpg"), *screenshots_dir.glob("*.png")]
     
     if not screenshots:
         print("\n⚠️  No screenshots found in screenshots/")
@@ -39,7 +39,7 @@ def main():
         return
     
     # Use the most recent screenshot
-    screenshot = sorted(screenshots)[-1]
+    screenshot = max(screenshots, key=lambda p: p.stat().st_mtime)
     
     print(f"\n📸 Analyzing screenshot: {screenshot.name}")
     
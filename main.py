@@ -3,20 +3,19 @@
 Main CLI entry point for Agentic Web Observer.
 """
 
-import asyncio
 import argparse
+import functools
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
 
-from src.navigation import NavigationAgent
-from src.benchmarking import BenchmarkRunner
-from src.utils import setup_directories, validate_api_keys, load_config
+from src.utils import setup_directories, validate_api_keys, load_config, run_async
 
 
-def parse_args():
-    """Parse command line arguments."""
+@functools.cache
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the CLI argument parser once per process."""
     parser = argparse.ArgumentParser(
         description="Agentic Web Observer - VLM-based Web Crawler",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -27,6 +26,7 @@ Examples:
   
   # Benchmark duel
   python main.py duel --url https://books.toscrape.com --goal "Extract book prices"
+  python main.py duel --url https://books.toscrape.com --goal "Extract book prices" --selectors-file selectors.json
   
   # Launch dashboard
   python main.py dashboard
@@ -50,6 +50,7 @@ Examples:
     duel_parser.add_argument("--goal", required=True, help="Crawling goal")
     duel_parser.add_argument("--provider", default="openai", choices=["openai", "google"], help="VLM provider")
     duel_parser.add_argument("--selectors", help="JSON string of CSS selectors for DOM crawler")
+    duel_parser.add_argument("--selectors-file", help="Path to a JSON file of CSS selectors for DOM crawler")
     
     # Dashboard command
     subparsers.add_parser("dashboard", help="Launch Streamlit dashboard")
@@ -57,11 +58,19 @@ Examples:
     # Validate command
     subparsers.add_parser("validate", help="Validate API keys and setup")
     
-    return parser.parse_args()
+    return parser
+
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    return _build_parser().parse_args(argv)
 
 
 async def run_navigate(args):
     """Run navigation command."""
+    # Imported here so --help, validate and dashboard skip Playwright/LangChain
+    from src.navigation import NavigationAgent
+    
     print("\n🤖 Starting VLM Navigation...")
     print(f"URL: {args.url}")
     print(f"Goal: {args.goal}")
@@ -87,24 +96,39 @@ async def run_navigate(args):
     print(f"\n📸 Screenshots saved to: screenshots/")
 
 
+def load_selectors_file(path: str) -> dict:
+    """Load DOM crawler selectors from a JSON file."""
+    data = Path(path).read_bytes()
+    try:
+        import orjson
+        return orjson.loads(data)
+    except ImportError:
+        import json
+        return json.loads(data)
+
+
 async def run_duel(args):
     """Run benchmark duel command."""
+    from src.benchmarking import BenchmarkRunner
+    
     print("\n⚔️  Starting Benchmark Duel...")
     print(f"URL: {args.url}")
     print(f"Goal: {args.goal}")
     print()
     
-    runner = BenchmarkRunner(
-        vlm_provider=args.provider,
-        max_steps=20
-    )
-    
     selectors = None
-    if args.selectors:
+    if args.selectors_file:
+        # A file avoids shell-escaping CSS selectors
+        selectors = load_selectors_file(args.selectors_file)
+    elif args.selectors:
         import json
         selectors = json.loads(args.selectors)
     
-    results = await runner.run_duel(args.url, args.goal, selectors)
+    async with BenchmarkRunner(
+        vlm_provider=args.provider,
+        max_steps=20
+    ) as runner:
+        results = await runner.run_duel(args.url, args.goal, selectors)
     
     print("\n📊 Results saved to: benchmarks/")
 
@@ -172,9 +196,9 @@ def main():
     
     # Route to command
     if args.command == "navigate":
-        asyncio.run(run_navigate(args))
+        run_async(run_navigate(args))
     elif args.command == "duel":
-        asyncio.run(run_duel(args))
+        run_async(run_duel(args))
     elif args.command == "dashboard":
         run_dashboard(args)
     elif args.command == "validate":
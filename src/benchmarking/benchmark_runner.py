@@ -3,26 +3,87 @@ Benchmark runner for comparing VLM and DOM-based crawlers in 'Duel' mode.
 """
 
 import asyncio
-from typing import Dict, List, Optional
+import multiprocessing
+import os
+import time
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 import json
 
+try:
+    import orjson
+except ImportError:  # optional, faster serialization
+    orjson = None
+
+try:
+    from rich.console import Console
+    from rich.table import Table
+except ImportError:  # optional, table output
+    Console = Table = None
+
+from playwright.async_api import async_playwright, Browser
+
 from ..navigation import NavigationAgent
 from ..crawler import DOMCrawler, SimpleSeleniumCrawler
 from .metrics import MetricsTracker, CrawlMetrics
 
 
+# Winner when at most one crawler succeeded, keyed by (vlm_success, dom_success)
+_WINNER_BY_OUTCOME = {
+    (True, False): "VLM (only successful)",
+    (False, True): "DOM (only successful)",
+    (False, False): "Tie (both failed)",
+}
+
+
+# Each DOM worker runs its own Chrome, so keep the pool small
+_MAX_DOM_WORKERS = 4
+
+# One Selenium crawler per worker process, so Chrome starts once per worker
+_worker_crawler: Optional[SimpleSeleniumCrawler] = None
+
+
+def _dom_worker(url: str, goal: str, selectors: Optional[Dict[str, str]]) -> Dict:
+    """Run a Selenium crawl in a worker process (module-level so it pickles)."""
+    global _worker_crawler
+    if _worker_crawler is None:
+        _worker_crawler = SimpleSeleniumCrawler(headless=True)
+        # Worker processes skip __del__ and atexit; multiprocessing runs
+        # finalizers with an exit priority when the worker exits
+        Finalize(None, _worker_crawler.close, exitpriority=10)
+    crawler = _worker_crawler
+    
+    # Create selectors if not provided
+    if not selectors:
+        dom_crawler = DOMCrawler()
+        selectors = dom_crawler.create_selectors_from_goal(goal)
+    
+    # Launch Chrome before timing: the VLM side also starts with an open browser
+    crawler._get_driver()
+    
+    start_time = time.perf_counter()
+    results = crawler.crawl(url, goal, selectors)
+    results["duration"] = time.perf_counter() - start_time
+    return results
+
+
 class BenchmarkRunner:
     """
     Run benchmarks comparing VLM and DOM-based crawlers.
+    
+    Use as an async context manager to launch one headless browser that is
+    shared by every VLM run instead of launching chromium per duel.
     """
     
     def __init__(
         self,
         vlm_provider: str = "openai",
         vlm_model: str = "gpt-4o",
-        max_steps: int = 20
+        max_steps: int = 20,
+        cache_dir: Optional[str] = None
     ):
         """
         Initialize benchmark runner.
@@ -31,16 +92,47 @@ class BenchmarkRunner:
             vlm_provider: VLM provider for navigation agent
             vlm_model: VLM model to use
             max_steps: Maximum navigation steps
+            cache_dir: Optional directory for caching VLM responses across runs
         """
         self.vlm_provider = vlm_provider
         self.vlm_model = vlm_model
         self.max_steps = max_steps
+        self.cache_dir = cache_dir
         
         self.metrics_tracker = MetricsTracker()
         
         # Create results directory
         self.results_dir = Path("benchmarks")
         self.results_dir.mkdir(exist_ok=True)
+        self.duels_log = self.results_dir / "duels.ndjson"
+        
+        # Shared browser, only set inside ``async with``
+        self._playwright = None
+        self._browser: Optional[Browser] = None
+        
+        # Worker processes for DOM crawls, created on first use
+        self._proc_pool: Optional[ProcessPoolExecutor] = None
+    
+    async def __aenter__(self) -> "BenchmarkRunner":
+        """Launch a shared headless browser for VLM runs."""
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the shared browser and DOM worker processes."""
+        # Make this runner's records visible to other trackers, e.g. the dashboard's
+        self.metrics_tracker.flush()
+        if self._proc_pool:
+            # Wait so each worker quits its Chrome; off the loop, it can take seconds
+            await asyncio.to_thread(self._proc_pool.shutdown, wait=True)
+            self._proc_pool = None
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
     
     async def run_vlm_crawler(
         self,
@@ -61,21 +153,22 @@ class BenchmarkRunner:
         print(f"   Goal: {goal}")
         print(f"   URL: {url}")
         
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             agent = NavigationAgent(
                 vision_provider=self.vlm_provider,
                 vision_model=self.vlm_model,
                 max_steps=self.max_steps,
-                headless=True
+                headless=True,
+                browser=self._browser,
+                vision_cache_dir=self.cache_dir
             )
             
             # Run navigation
             final_state = await agent.navigate(url, goal)
             
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             
             # Determine success based on completion and lack of errors
             success = (
@@ -84,10 +177,10 @@ class BenchmarkRunner:
                 len(final_state.get("action_history", [])) > 0
             )
             
-            # Estimate API calls and tokens (rough estimate)
+            # One vision call per step; tokens as reported by the provider
             api_calls = final_state.get("step_count", 0)
-            # Assume ~1500 tokens per vision API call (image + text)
-            total_tokens = api_calls * 1500
+            token_usage = final_state.get("token_usage", {})
+            total_tokens = token_usage.get("prompt", 0) + token_usage.get("completion", 0)
             
             results = {
                 "crawler_type": "vlm",
@@ -123,8 +216,7 @@ class BenchmarkRunner:
             return results
             
         except Exception as e:
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             
             error_results = {
                 "crawler_type": "vlm",
@@ -140,6 +232,16 @@ class BenchmarkRunner:
             
             return error_results
     
+    def _get_proc_pool(self) -> ProcessPoolExecutor:
+        """Return the DOM worker pool, creating it on first use."""
+        if self._proc_pool is None:
+            # Spawn rather than fork: this process already runs threads and an event loop
+            self._proc_pool = ProcessPoolExecutor(
+                max_workers=min(_MAX_DOM_WORKERS, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._proc_pool
+    
     def run_dom_crawler(
         self,
         url: str,
@@ -147,7 +249,29 @@ class BenchmarkRunner:
         selectors: Optional[Dict[str, str]] = None
     ) -> Dict:
         """
-        Run DOM-based crawler.
+        Run DOM-based crawler; blocking version of run_dom_crawler_async.
+        
+        Args:
+            url: Starting URL
+            goal: Navigation goal
+            selectors: CSS selectors for target data
+            
+        Returns:
+            Results dictionary
+        """
+        return asyncio.run(self.run_dom_crawler_async(url, goal, selectors))
+    
+    async def run_dom_crawler_async(
+        self,
+        url: str,
+        goal: str,
+        selectors: Optional[Dict[str, str]] = None
+    ) -> Dict:
+        """
+        Run DOM-based crawler in a worker process.
+        
+        The reported duration is measured in the worker around the crawl
+        itself, so process start-up and Chrome launch are not counted.
         
         Args:
             url: Starting URL
@@ -161,24 +285,17 @@ class BenchmarkRunner:
         print(f"   Goal: {goal}")
         print(f"   URL: {url}")
         
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
-            crawler = SimpleSeleniumCrawler(headless=True)
-            
-            # Create selectors if not provided
-            if not selectors:
-                dom_crawler = DOMCrawler()
-                selectors = dom_crawler.create_selectors_from_goal(goal)
-            
-            # Run crawler
-            results = crawler.crawl(url, goal, selectors)
-            
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
+            # Crawl and HTML parsing run in another process, off the GIL
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self._get_proc_pool(), _dom_worker, url, goal, selectors
+            )
             
+            duration = results["duration"]
             results["crawler_type"] = "dom"
-            results["duration"] = duration
             
             # Record metrics
             self.metrics_tracker.record_crawl(
@@ -194,13 +311,12 @@ class BenchmarkRunner:
             
             print(f"   ✅ Completed in {duration:.2f}s")
             print(f"   Success: {results.get('success', False)}")
-            print(f"   Data points: {len(results.get('data_extracted', []))}")
+            print(f"   Data points: {sum(len(page['fields']) for page in results.get('data_extracted', []))}")
             
             return results
             
         except Exception as e:
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
+            duration = time.perf_counter() - start_time
             
             error_results = {
                 "crawler_type": "dom",
@@ -220,7 +336,8 @@ class BenchmarkRunner:
         self,
         url: str,
         goal: str,
-        selectors: Optional[Dict[str, str]] = None
+        selectors: Optional[Dict[str, str]] = None,
+        append_to_log: bool = False
     ) -> Dict:
         """
         Run both crawlers in 'Duel' mode and compare results.
@@ -229,6 +346,8 @@ class BenchmarkRunner:
             url: Starting URL
             goal: Navigation goal
             selectors: CSS selectors for DOM crawler
+            append_to_log: Append results as one line to the duels.ndjson log
+                instead of writing a separate duel file
             
         Returns:
             Comparison results
@@ -237,11 +356,11 @@ class BenchmarkRunner:
         print("🥊 CRAWLER DUEL MODE")
         print("="*60)
         
-        # Run VLM crawler
-        vlm_results = await self.run_vlm_crawler(url, goal)
-        
-        # Run DOM crawler
-        dom_results = self.run_dom_crawler(url, goal, selectors)
+        # Run both crawlers concurrently; the blocking Selenium crawl runs in
+        # a worker process so VLM navigation keeps progressing
+        vlm_task = asyncio.create_task(self.run_vlm_crawler(url, goal))
+        dom_task = asyncio.create_task(self.run_dom_crawler_async(url, goal, selectors))
+        vlm_results, dom_results = await asyncio.gather(vlm_task, dom_task)
         
         # Compare results
         comparison = {
@@ -262,45 +381,96 @@ class BenchmarkRunner:
         }
         
         # Save duel results
-        duel_file = self.results_dir / f"duel_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(duel_file, 'w') as f:
-            json.dump(comparison, f, indent=2)
+        if append_to_log:
+            self._append_duel_log(comparison)
+        else:
+            # Nanosecond suffix is cheap and unique even for duels within one second
+            duel_file = self.results_dir / f"duel_{time.time_ns()}.json"
+            self._write_duel(duel_file, comparison)
         
         # Print comparison
-        print("\n" + "="*60)
-        print("📊 DUEL RESULTS")
-        print("="*60)
-        print(f"VLM Success: {comparison['comparison']['vlm_success']}")
-        print(f"DOM Success: {comparison['comparison']['dom_success']}")
-        print(f"VLM Duration: {comparison['comparison']['vlm_duration']:.2f}s")
-        print(f"DOM Duration: {comparison['comparison']['dom_duration']:.2f}s")
-        print(f"VLM Cost: ${comparison['comparison']['vlm_cost']:.4f}")
-        print(f"DOM Cost: ${comparison['comparison']['dom_cost']:.4f}")
-        print(f"\n🏆 Winner: {comparison['comparison']['winner']}")
-        print("="*60)
+        self._print_duel_results(comparison['comparison'])
         
         return comparison
     
+    async def run_duel_batch(
+        self,
+        tasks: List[Tuple[str, str, Optional[Dict[str, str]]]],
+        concurrency: int = 8
+    ) -> List[Dict]:
+        """
+        Run many duels concurrently on the current event loop.
+        
+        Args:
+            tasks: List of (url, goal, selectors) tuples
+            concurrency: Maximum number of duels in flight at once
+        
+        Returns:
+            Comparison results, in the same order as tasks
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _run_one(url: str, goal: str, selectors: Optional[Dict[str, str]]) -> Dict:
+            async with semaphore:
+                return await self.run_duel(url, goal, selectors, append_to_log=True)
+        
+        return await asyncio.gather(*[_run_one(*task) for task in tasks])
+    
+    def _print_duel_results(self, summary: Dict):
+        """Print the duel summary as one table in a single write."""
+        rows = [
+            ("Success", str(summary['vlm_success']), str(summary['dom_success'])),
+            ("Duration", f"{summary['vlm_duration']:.2f}s", f"{summary['dom_duration']:.2f}s"),
+            ("Cost", f"${summary['vlm_cost']:.4f}", f"${summary['dom_cost']:.4f}"),
+        ]
+        
+        if Table is not None:
+            table = Table(title="📊 DUEL RESULTS", caption=f"🏆 Winner: {summary['winner']}")
+            table.add_column("Metric")
+            table.add_column("VLM")
+            table.add_column("DOM")
+            for row in rows:
+                table.add_row(*row)
+            Console().print(table)
+            return
+        
+        lines = ["", "=" * 60, "📊 DUEL RESULTS", "=" * 60]
+        lines += [f"{'Metric':<10} {'VLM':>15} {'DOM':>15}"]
+        lines += [f"{name:<10} {vlm:>15} {dom:>15}" for name, vlm, dom in rows]
+        lines += ["", f"🏆 Winner: {summary['winner']}", "=" * 60]
+        print("\n".join(lines))
+    
+    def _write_duel(self, duel_file: Path, comparison: Dict):
+        """Write a single duel result as indented JSON."""
+        if orjson is not None:
+            with open(duel_file, 'wb') as f:
+                f.write(orjson.dumps(comparison, option=orjson.OPT_INDENT_2))
+        else:
+            with open(duel_file, 'w') as f:
+                json.dump(comparison, f, indent=2)
+    
+    def _append_duel_log(self, comparison: Dict):
+        """Append a duel result as one line to the newline-delimited log."""
+        if orjson is not None:
+            line = orjson.dumps(comparison) + b"\n"
+        else:
+            line = (json.dumps(comparison) + "\n").encode('utf-8')
+        
+        with open(self.duels_log, 'ab') as f:
+            f.write(line)
+    
     def _determine_winner(self, vlm_results: Dict, dom_results: Dict) -> str:
         """Determine winner based on success and efficiency."""
-        vlm_success = vlm_results.get("success", False)
-        dom_success = dom_results.get("success", False)
-        
-        if vlm_success and not dom_success:
-            return "VLM (only successful)"
-        elif dom_success and not vlm_success:
-            return "DOM (only successful)"
-        elif vlm_success and dom_success:
-            # Both succeeded, compare duration
-            vlm_duration = vlm_results.get("duration", float('inf'))
-            dom_duration = dom_results.get("duration", float('inf'))
-            
-            if vlm_duration < dom_duration:
-                return "VLM (faster)"
-            else:
-                return "DOM (faster)"
-        else:
-            return "Tie (both failed)"
+        outcome = (bool(vlm_results.get("success")), bool(dom_results.get("success")))
+        
+        winner = _WINNER_BY_OUTCOME.get(outcome)
+        if winner:
+            return winner
+        
+        # Both succeeded, compare duration
+        if vlm_results.get("duration", float('inf')) < dom_results.get("duration", float('inf')):
+            return "VLM (faster)"
+        return "DOM (faster)"
     
     def run_resilience_test(
         self,
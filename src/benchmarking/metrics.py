@@ -2,16 +2,29 @@
 Benchmarking and metrics tracking for VLM vs DOM-based crawlers.
 """
 
+import csv
 import json
+import operator
 import time
+import weakref
+from collections import defaultdict
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from datetime import datetime
 from pathlib import Path
-import pandas as pd
 
+try:
+    import orjson
+except ImportError:  # optional, faster serialization
+    orjson = None
 
-@dataclass
+try:
+    import ijson
+except ImportError:  # optional, streaming legacy-history migration
+    ijson = None
+
+
+@dataclass(slots=True)
 class CrawlMetrics:
     """Metrics for a single crawl session."""
     crawler_type: str  # 'vlm' or 'dom'
@@ -29,7 +42,7 @@ class CrawlMetrics:
     timestamp: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ResilienceMetrics:
     """Metrics for crawler resilience to code changes."""
     crawler_type: str
@@ -41,46 +54,195 @@ class ResilienceMetrics:
     failure_reason: Optional[str]
 
 
+# Field names and a C-level getter per record type; asdict() deep-copies
+# every field (including the errors list) on each call
+_CRAWL_FIELDS = tuple(f.name for f in fields(CrawlMetrics))
+_RESILIENCE_FIELDS = tuple(f.name for f in fields(ResilienceMetrics))
+_RECORD_GETTERS = {
+    CrawlMetrics: (_CRAWL_FIELDS, operator.attrgetter(*_CRAWL_FIELDS)),
+    ResilienceMetrics: (_RESILIENCE_FIELDS, operator.attrgetter(*_RESILIENCE_FIELDS))
+}
+
+
+def _to_dict(record) -> Dict:
+    """Shallow dict of a CrawlMetrics or ResilienceMetrics record."""
+    names, get = _RECORD_GETTERS[type(record)]
+    return dict(zip(names, get(record)))
+
+
+def _new_crawl_aggregate() -> Dict:
+    """Empty running totals for one crawler type."""
+    return {'count': 0, 'success': 0, 'duration': 0.0, 'cost': 0.0, 'tokens': 0}
+
+
+def _new_resilience_aggregate() -> Dict:
+    """Empty running resilience totals for one crawler type."""
+    return {'count': 0, 'score': 0.0}
+
+
+def _dumps(record: Dict) -> bytes:
+    """Serialize one record to a JSON line (without the newline)."""
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record).encode('utf-8')
+
+
+def _loads(data: bytes):
+    """Parse JSON from bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _write_pending(logs: Tuple[Tuple, ...]):
+    """Write each log's buffered lines; logs are (file, pending lines) pairs."""
+    for fp, pending in logs:
+        if pending and not fp.closed:
+            fp.write(b"".join(pending))
+            fp.flush()
+            pending.clear()
+
+
+def _close_logs(logs: Tuple[Tuple, ...]):
+    """Flush and close the logs (finalizer, so it must not reference the tracker)."""
+    _write_pending(logs)
+    for fp, _ in logs:
+        fp.close()
+
+
 class MetricsTracker:
     """
     Track and calculate metrics for crawler performance.
+    
+    Records are appended to JSON-Lines logs (``crawl.jsonl`` and
+    ``resilience.jsonl``), so each record costs one small write instead of
+    rewriting the whole history. Writes are buffered and flushed every
+    ``flush_threshold`` records, on ``flush()``/``close()`` and at exit.
     """
     
-    def __init__(self, output_dir: str = "data"):
-        """Initialize metrics tracker."""
+    def __init__(self, output_dir: str = "data", flush_threshold: int = 64):
+        """
+        Initialize metrics tracker.
+        
+        Args:
+            output_dir: Directory for the metrics logs
+            flush_threshold: Number of buffered records that triggers a write
+        """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
+        self.crawl_log = self.output_dir / "crawl.jsonl"
+        self.resilience_log = self.output_dir / "resilience.jsonl"
+        # Pre-JSONL history file, migrated on first load
         self.metrics_file = self.output_dir / "metrics.json"
+        
         self.metrics_history: List[CrawlMetrics] = []
         self.resilience_history: List[ResilienceMetrics] = []
         
         self._load_history()
+        
+        # Running per-type totals so the calculate_* queries are O(1)
+        self._rebuild_aggregates()
+        
+        self._crawl_fp = open(self.crawl_log, 'ab')
+        self._resilience_fp = open(self.resilience_log, 'ab')
+        
+        # Serialized lines waiting to be written
+        self._flush_threshold = flush_threshold
+        self._pending_crawls: List[bytes] = []
+        self._pending_resilience: List[bytes] = []
+        self._logs = (
+            (self._crawl_fp, self._pending_crawls),
+            (self._resilience_fp, self._pending_resilience)
+        )
+        
+        # Runs on close(), garbage collection or interpreter exit, whichever
+        # comes first; unlike atexit.register it doesn't keep the tracker alive
+        self._finalizer = weakref.finalize(self, _close_logs, self._logs)
     
     def _load_history(self):
         """Load existing metrics history."""
-        if self.metrics_file.exists():
-            try:
-                with open(self.metrics_file, 'r') as f:
-                    data = json.load(f)
-                    self.metrics_history = [
-                        CrawlMetrics(**m) for m in data.get('crawl_metrics', [])
-                    ]
-                    self.resilience_history = [
-                        ResilienceMetrics(**m) for m in data.get('resilience_metrics', [])
-                    ]
-            except Exception as e:
-                print(f"Error loading metrics history: {e}")
+        try:
+            if self.crawl_log.exists() or self.resilience_log.exists():
+                self.metrics_history = self._read_log(self.crawl_log, CrawlMetrics)
+                self.resilience_history = self._read_log(self.resilience_log, ResilienceMetrics)
+            elif self.metrics_file.exists():
+                self._migrate_legacy_history()
+        except Exception as e:
+            print(f"Error loading metrics history: {e}")
     
-    def _save_history(self):
-        """Save metrics history to file."""
-        data = {
-            'crawl_metrics': [asdict(m) for m in self.metrics_history],
-            'resilience_metrics': [asdict(m) for m in self.resilience_history]
-        }
+    def _read_log(self, path: Path, record_type):
+        """Read records from a JSON-Lines log, skipping malformed lines."""
+        records = []
+        if not path.exists():
+            return records
         
-        with open(self.metrics_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(record_type(**_loads(line)))
+                except (ValueError, TypeError):
+                    # e.g. a line truncated by a crash mid-write
+                    continue
+        
+        return records
+    
+    def _migrate_legacy_history(self):
+        """Load the old single-file metrics.json and rewrite it as JSON-Lines."""
+        self.metrics_history = self._migrate_section(
+            'crawl_metrics', CrawlMetrics, self.crawl_log
+        )
+        self.resilience_history = self._migrate_section(
+            'resilience_metrics', ResilienceMetrics, self.resilience_log
+        )
+    
+    def _migrate_section(self, key: str, record_type, log_path: Path) -> List:
+        """
+        Convert one list of the legacy metrics.json into a JSON-Lines log.
+        
+        With ijson installed the file is streamed one record at a time
+        instead of materializing the whole document.
+        
+        Args:
+            key: Top-level key of the record list in metrics.json
+            record_type: Dataclass to build from each record
+            log_path: JSON-Lines log to write
+        
+        Returns:
+            Loaded records
+        """
+        records = []
+        # Only publish the log once the whole section converted cleanly
+        tmp_path = log_path.with_suffix('.jsonl.tmp')
+        
+        with open(self.metrics_file, 'rb') as src, open(tmp_path, 'wb') as dst:
+            if ijson is not None:
+                items = ijson.items(src, f'{key}.item', use_float=True)
+            else:
+                items = _loads(src.read()).get(key, [])
+            
+            for item in items:
+                records.append(record_type(**item))
+                dst.write(_dumps(item) + b"\n")
+        
+        tmp_path.replace(log_path)
+        return records
+    
+    def _append(self, pending: List[bytes], record: Dict):
+        """Buffer one record, writing the buffers once the threshold is hit."""
+        pending.append(_dumps(record) + b"\n")
+        if len(pending) >= self._flush_threshold:
+            self.flush()
+    
+    def flush(self):
+        """Write all buffered records to the logs."""
+        _write_pending(self._logs)
+    
+    def close(self):
+        """Flush buffered records and close the metrics logs."""
+        self._finalizer()
     
     def record_crawl(
         self,
@@ -136,7 +298,8 @@ class MetricsTracker:
         )
         
         self.metrics_history.append(metrics)
-        self._save_history()
+        self._update_aggregates(metrics)
+        self._append(self._pending_crawls, _to_dict(metrics))
         
         return metrics
     
@@ -184,10 +347,64 @@ class MetricsTracker:
         )
         
         self.resilience_history.append(metrics)
-        self._save_history()
+        self._update_resilience_aggregates(metrics)
+        self._append(self._pending_resilience, _to_dict(metrics))
         
         return metrics
     
+    def _update_aggregates(self, metrics: CrawlMetrics):
+        """Fold one crawl into the running per-type totals and index."""
+        self._by_type[metrics.crawler_type].append(metrics)
+        
+        agg = self._agg[metrics.crawler_type]
+        agg['count'] += 1
+        agg['success'] += bool(metrics.success)
+        agg['duration'] += metrics.duration_seconds
+        agg['cost'] += metrics.cost_usd
+        agg['tokens'] += metrics.total_tokens
+    
+    def _update_resilience_aggregates(self, metrics: ResilienceMetrics):
+        """Fold one resilience test into the running per-type totals."""
+        agg = self._resilience_agg[metrics.crawler_type]
+        agg['count'] += 1
+        agg['score'] += metrics.resilience_score
+    
+    def _rebuild_aggregates(self):
+        """Recompute running totals from the loaded history."""
+        self._agg = defaultdict(_new_crawl_aggregate)
+        self._by_type: Dict[str, List[CrawlMetrics]] = defaultdict(list)
+        self._resilience_agg = defaultdict(_new_resilience_aggregate)
+        
+        for metrics in self.metrics_history:
+            self._update_aggregates(metrics)
+        for metrics in self.resilience_history:
+            self._update_resilience_aggregates(metrics)
+    
+    def get_crawls(self, crawler_type: Optional[str] = None) -> List[CrawlMetrics]:
+        """
+        Return recorded crawls, optionally for a single crawler type.
+        
+        Args:
+            crawler_type: Filter by crawler type, or None for all
+        
+        Returns:
+            Crawl metrics in recording order (do not modify)
+        """
+        if crawler_type:
+            return self._by_type.get(crawler_type, [])
+        return self.metrics_history
+    
+    def _aggregate(self, crawler_type: Optional[str]) -> Dict:
+        """Return running totals for a crawler type, or summed over all types."""
+        if crawler_type:
+            return self._agg.get(crawler_type) or _new_crawl_aggregate()
+        
+        total = _new_crawl_aggregate()
+        for agg in self._agg.values():
+            for key, value in agg.items():
+                total[key] += value
+        return total
+    
     def calculate_success_rate(self, crawler_type: Optional[str] = None) -> float:
         """
         Calculate success rate for a crawler type.
@@ -198,15 +415,12 @@ class MetricsTracker:
         Returns:
             Success rate (0.0 to 1.0)
         """
-        metrics = self.metrics_history
-        if crawler_type:
-            metrics = [m for m in metrics if m.crawler_type == crawler_type]
+        agg = self._aggregate(crawler_type)
         
-        if not metrics:
+        if not agg['count']:
             return 0.0
         
-        successes = sum(1 for m in metrics if m.success)
-        return successes / len(metrics)
+        return agg['success'] / agg['count']
     
     def calculate_avg_resilience(self, crawler_type: Optional[str] = None) -> float:
         """
@@ -218,14 +432,16 @@ class MetricsTracker:
         Returns:
             Average resilience score (0.0 to 1.0)
         """
-        metrics = self.resilience_history
         if crawler_type:
-            metrics = [m for m in metrics if m.crawler_type == crawler_type]
+            aggs = [self._resilience_agg.get(crawler_type) or _new_resilience_aggregate()]
+        else:
+            aggs = list(self._resilience_agg.values())
         
-        if not metrics:
+        count = sum(agg['count'] for agg in aggs)
+        if not count:
             return 0.0
         
-        return sum(m.resilience_score for m in metrics) / len(metrics)
+        return sum(agg['score'] for agg in aggs) / count
     
     def calculate_cost_efficiency(self, crawler_type: str = 'vlm') -> Dict:
         """
@@ -237,9 +453,9 @@ class MetricsTracker:
         Returns:
             Dictionary with cost metrics
         """
-        metrics = [m for m in self.metrics_history if m.crawler_type == crawler_type]
+        agg = self._aggregate(crawler_type)
         
-        if not metrics:
+        if not agg['count']:
             return {
                 "total_cost": 0.0,
                 "avg_cost_per_crawl": 0.0,
@@ -247,14 +463,13 @@ class MetricsTracker:
                 "avg_tokens_per_crawl": 0
             }
         
-        total_cost = sum(m.cost_usd for m in metrics)
-        successful_metrics = [m for m in metrics if m.success]
+        total_cost = agg['cost']
         
         return {
             "total_cost": total_cost,
-            "avg_cost_per_crawl": total_cost / len(metrics),
-            "cost_per_success": total_cost / len(successful_metrics) if successful_metrics else 0.0,
-            "avg_tokens_per_crawl": sum(m.total_tokens for m in metrics) / len(metrics)
+            "avg_cost_per_crawl": total_cost / agg['count'],
+            "cost_per_success": total_cost / agg['success'] if agg['success'] else 0.0,
+            "avg_tokens_per_crawl": agg['tokens'] / agg['count']
         }
     
     def compare_crawlers(self) -> Dict:
@@ -264,21 +479,21 @@ class MetricsTracker:
         Returns:
             Comparison dictionary with metrics for both
         """
-        vlm_metrics = [m for m in self.metrics_history if m.crawler_type == 'vlm']
-        dom_metrics = [m for m in self.metrics_history if m.crawler_type == 'dom']
+        vlm_agg = self._aggregate('vlm')
+        dom_agg = self._aggregate('dom')
         
         comparison = {
             "vlm": {
-                "count": len(vlm_metrics),
+                "count": vlm_agg['count'],
                 "success_rate": self.calculate_success_rate('vlm'),
-                "avg_duration": sum(m.duration_seconds for m in vlm_metrics) / len(vlm_metrics) if vlm_metrics else 0,
+                "avg_duration": vlm_agg['duration'] / vlm_agg['count'] if vlm_agg['count'] else 0,
                 "avg_resilience": self.calculate_avg_resilience('vlm'),
                 "cost_metrics": self.calculate_cost_efficiency('vlm')
             },
             "dom": {
-                "count": len(dom_metrics),
+                "count": dom_agg['count'],
                 "success_rate": self.calculate_success_rate('dom'),
-                "avg_duration": sum(m.duration_seconds for m in dom_metrics) / len(dom_metrics) if dom_metrics else 0,
+                "avg_duration": dom_agg['duration'] / dom_agg['count'] if dom_agg['count'] else 0,
                 "avg_resilience": self.calculate_avg_resilience('dom'),
                 "cost_metrics": {"total_cost": 0.0, "note": "DOM crawler has no API costs"}
             }
@@ -286,19 +501,23 @@ class MetricsTracker:
         
         return comparison
     
-    def export_to_csv(self, filename: Optional[str] = None):
+    def export_to_csv(self, filename: Optional[str] = None, crawler_type: Optional[str] = None):
         """
         Export metrics to CSV for analysis.
         
         Args:
             filename: Output filename (optional)
+            crawler_type: Only export this crawler type (optional)
         """
         if not filename:
             filename = self.output_dir / f"metrics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
-        # Convert metrics to DataFrame
-        df = pd.DataFrame([asdict(m) for m in self.metrics_history])
-        df.to_csv(filename, index=False)
+        # Write rows as tuples; avoids a dict allocation per record
+        get_row = _RECORD_GETTERS[CrawlMetrics][1]
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(_CRAWL_FIELDS)
+            writer.writerows(map(get_row, self.get_crawls(crawler_type)))
         
         return filename
     
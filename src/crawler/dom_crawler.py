@@ -1,108 +1,143 @@
 """
-DOM-based web crawler using Scrapy for benchmarking comparison.
+DOM-based web crawler for benchmarking comparison.
 """
 
-import scrapy
-from scrapy.crawler import CrawlerProcess
-from scrapy.http import Response
-from typing import Dict, List, Optional, Callable
+import asyncio
+import importlib.util
+import time
+import httpx
+from parsel import Selector
+from selectolax.lexbor import LexborHTMLParser
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urljoin, urlparse
 import json
 
 
-class DOMBasedSpider(scrapy.Spider):
-    """
-    Traditional DOM-based spider for comparison with VLM approach.
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+# Selector engines: plain CSS runs on Lexbor, everything else on parsel
+_LEXBOR, _PARSEL_CSS, _PARSEL_XPATH = "lexbor", "css", "xpath"
+
+
+def _plan_selectors(selectors: Dict[str, str]) -> List[Tuple[str, str, str]]:
     """
+    Classify selectors once as (key, engine, selector).
     
-    name = "dom_spider"
+    Lexbor has no XPath or parsel pseudo-elements (``::text``,
+    ``::attr(...)``), so those selectors stay on parsel.
+    """
+    plan = []
+    for key, selector in selectors.items():
+        if selector.startswith("//"):
+            engine = _PARSEL_XPATH
+        elif "::" in selector:
+            engine = _PARSEL_CSS
+        else:
+            engine = _LEXBOR
+        plan.append((key, engine, selector))
+    return plan
+
+
+def _lexbor_values(tree: LexborHTMLParser, selector: str) -> List[str]:
+    """Text (or href) of each distinct node matching a CSS selector."""
+    # Lexbor yields a node once per matching alternative of a selector list
+    nodes = {node.mem_id: node for node in tree.css(selector)}.values()
+    return [
+        node.text() or node.attributes.get("href") or ""
+        for node in nodes
+    ]
+
+
+def _extract_fields(
+    html: str,
+    selector_plan: List[Tuple[str, str, str]],
+    tree: Optional[LexborHTMLParser] = None
+) -> Dict[str, List[str]]:
+    """
+    Run planned selectors against a page.
     
-    def __init__(
-        self,
-        start_url: str,
-        goal: str,
-        selectors: Dict[str, str],
-        max_pages: int = 20,
-        callback: Optional[Callable] = None,
-        *args,
-        **kwargs
-    ):
-        """
-        Initialize DOM-based spider.
+    Args:
+        html: Page source
+        selector_plan: Output of _plan_selectors
+        tree: Already-parsed Lexbor tree of ``html``, if any
         
-        Args:
-            start_url: Starting URL
-            goal: Crawling goal (for documentation)
-            selectors: CSS/XPath selectors for target elements
-            max_pages: Maximum pages to crawl
-            callback: Optional callback for extracted data
-        """
-        super().__init__(*args, **kwargs)
-        self.start_urls = [start_url]
-        self.goal = goal
-        self.selectors = selectors
-        self.max_pages = max_pages
-        self.pages_crawled = 0
-        self.data_callback = callback
-        self.extracted_data = []
-        self.action_history = []
+    Returns:
+        Values per selector key, for keys that matched anything
+    """
+    fields = {}
+    fallback = None
     
-    def parse(self, response: Response):
-        """Parse the response and extract data."""
-        self.pages_crawled += 1
-        
-        # Record action
-        self.action_history.append({
-            "url": response.url,
-            "timestamp": datetime.now().isoformat(),
-            "step": self.pages_crawled
-        })
-        
-        # Extract data based on selectors
-        for key, selector in self.selectors.items():
-            if selector.startswith("//"):
-                # XPath selector
-                elements = response.xpath(selector).getall()
+    for key, engine, query in selector_plan:
+        try:
+            if engine == _LEXBOR:
+                if tree is None:
+                    tree = LexborHTMLParser(html)
+                elements = _lexbor_values(tree, query)
             else:
-                # CSS selector
-                elements = response.css(selector).getall()
-            
-            if elements:
-                data = {
-                    "field": key,
-                    "values": elements,
-                    "url": response.url,
-                    "timestamp": datetime.now().isoformat()
-                }
-                self.extracted_data.append(data)
-                
-                if self.data_callback:
-                    self.data_callback(data)
+                if fallback is None:
+                    fallback = Selector(text=html)
+                select = fallback.xpath if engine == _PARSEL_XPATH else fallback.css
+                elements = select(query).getall()
+        except Exception as e:
+            print(f"Error extracting {key}: {e}")
+            continue
         
-        # Follow links if not at max pages
-        if self.pages_crawled < self.max_pages:
-            for link in response.css('a::attr(href)').getall()[:5]:
-                yield response.follow(link, self.parse)
+        if elements:
+            fields[key] = elements
     
-    def closed(self, reason):
-        """Called when spider closes."""
-        self.logger.info(f"Spider closed. Pages crawled: {self.pages_crawled}")
+    return fields
+
+
+# Basic heuristics for common goals: (goal keywords, selectors to add)
+_GOAL_RULES = (
+    (("price", "laptop"), {
+        "prices": ".price, .product-price, [class*='price']",
+        "products": ".product-name, .product-title, h2.title"
+    }),
+    (("login",), {
+        "login_button": "button[type='submit'], input[type='submit']",
+        "forms": "form"
+    }),
+    (("article", "content"), {
+        "articles": "article, .article, .post",
+        "headings": "h1, h2, h3"
+    })
+)
+
+_DEFAULT_SELECTORS = {
+    "links": "a::attr(href)",
+    "text": "p::text"
+}
 
 
 class DOMCrawler:
     """
-    Wrapper for DOM-based crawling using Scrapy.
+    DOM-based crawler that fetches pages concurrently with httpx and
+    extracts data with parsel selectors.
     """
     
-    def __init__(self, max_pages: int = 20):
+    def __init__(self, max_pages: int = 20, concurrency: int = 8, request_delay: float = 1.0):
         """
         Initialize DOM crawler.
         
         Args:
             max_pages: Maximum pages to crawl
+            concurrency: Maximum concurrent requests
+            request_delay: Minimum seconds between requests to the same host;
+                the default is polite to target sites, lower it only for
+                hosts you control
         """
         self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.request_delay = request_delay
+        # Earliest event-loop time the next request to each host may start
+        self._next_request_at: Dict[str, float] = {}
         self.results_dir = Path("data")
         self.results_dir.mkdir(exist_ok=True)
     
@@ -123,60 +158,172 @@ class DOMCrawler:
         Returns:
             Crawl results with metrics
         """
-        start_time = datetime.now()
+        return asyncio.run(self.crawl_async(url, goal, selectors))
+    
+    async def crawl_async(
+        self,
+        url: str,
+        goal: str,
+        selectors: Dict[str, str]
+    ) -> Dict:
+        """
+        Perform DOM-based crawling on the running event loop.
         
-        # Setup crawler
-        process = CrawlerProcess(settings={
-            'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'ROBOTSTXT_OBEY': False,
-            'CONCURRENT_REQUESTS': 1,
-            'DOWNLOAD_DELAY': 1,
-            'LOG_LEVEL': 'INFO'
-        })
+        Starting from ``url``, follows up to 5 links per page breadth-first
+        until ``max_pages`` pages have been parsed.
         
-        spider_args = {
-            'start_url': url,
-            'goal': goal,
-            'selectors': selectors,
-            'max_pages': self.max_pages
-        }
+        Args:
+            url: Starting URL
+            goal: Crawling goal
+            selectors: CSS/XPath selectors for target data
+            
+        Returns:
+            Crawl results with metrics
+        """
+        async with self._new_client() as client:
+            return await self._crawl_site(client, url, goal, _plan_selectors(selectors))
+    
+    async def crawl_many(
+        self,
+        urls: List[str],
+        goal: str,
+        selectors: Dict[str, str],
+        concurrency: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Crawl several start URLs concurrently over one connection pool.
         
-        # Run crawler
-        spider = None
+        Args:
+            urls: Starting URLs
+            goal: Crawling goal
+            selectors: CSS/XPath selectors for target data
+            concurrency: Maximum sites crawled at once (default: self.concurrency)
+            
+        Returns:
+            Crawl results for each URL, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+        # Classify selectors once for every site rather than per crawl
+        selector_plan = _plan_selectors(selectors)
         
-        def spider_opened(spider_instance):
-            nonlocal spider
-            spider = spider_instance
+        async with self._new_client() as client:
+            async def crawl_one(url: str) -> Dict:
+                async with semaphore:
+                    return await self._crawl_site(client, url, goal, selector_plan)
+            
+            return await asyncio.gather(*(crawl_one(url) for url in urls))
+    
+    def _new_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client used for a crawl."""
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers={'User-Agent': USER_AGENT},
+            follow_redirects=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=self.concurrency)
+        )
+    
+    async def _crawl_site(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        goal: str,
+        selector_plan: List[Tuple[str, str, str]]
+    ) -> Dict:
+        """Crawl one site with the given client and selector plan, and save its results."""
+        start_time = time.monotonic()
+        
+        extracted_data = []
+        action_history = []
+        pages_crawled = 0
         
-        from scrapy.signalmanager import dispatcher
-        from scrapy import signals
-        dispatcher.connect(spider_opened, signal=signals.spider_opened)
+        seen = {url}
+        frontier = [url]
         
-        process.crawl(DOMBasedSpider, **spider_args)
-        process.start()
+        while frontier and pages_crawled < self.max_pages:
+            batch = frontier[:self.max_pages - pages_crawled]
+            frontier = frontier[len(batch):]
+            
+            pages = await asyncio.gather(*(self._fetch(client, u) for u in batch))
+            
+            for page_url, html in pages:
+                if html is None or pages_crawled >= self.max_pages:
+                    continue
+                
+                pages_crawled += 1
+                now_iso = datetime.now().isoformat()
+                tree = LexborHTMLParser(html)
+                
+                action_history.append({
+                    "url": page_url,
+                    "timestamp": now_iso,
+                    "step": pages_crawled
+                })
+                
+                fields = _extract_fields(html, selector_plan, tree)
+                if fields:
+                    extracted_data.append({
+                        "url": page_url,
+                        "timestamp": now_iso,
+                        "fields": fields
+                    })
+                
+                for link in tree.css('a[href]')[:5]:
+                    next_url = urljoin(page_url, link.attributes["href"])
+                    if next_url.startswith("http") and next_url not in seen:
+                        seen.add(next_url)
+                        frontier.append(next_url)
         
+        duration = time.monotonic() - start_time
         end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
         
         # Compile results
         results = {
             "goal": goal,
             "start_url": url,
-            "pages_crawled": spider.pages_crawled if spider else 0,
-            "data_extracted": spider.extracted_data if spider else [],
-            "action_history": spider.action_history if spider else [],
+            "pages_crawled": pages_crawled,
+            "data_extracted": extracted_data,
+            "action_history": action_history,
             "duration_seconds": duration,
-            "success": len(spider.extracted_data) > 0 if spider else False,
-            "timestamp": datetime.now().isoformat()
+            "success": len(extracted_data) > 0,
+            "timestamp": end_time.isoformat()
         }
         
         # Save results
-        results_file = self.results_dir / f"dom_crawl_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        results_file = self.results_dir / f"dom_crawl_{end_time.strftime('%Y%m%d_%H%M%S_%f')}.json"
         with open(results_file, 'w') as f:
             json.dump(results, f, indent=2)
         
         return results
     
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> Tuple[str, Optional[str]]:
+        """Fetch a page, returning (final_url, html) or (url, None) on failure."""
+        await self._wait_for_host(url)
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Error fetching {url}: {e}")
+            return url, None
+        
+        if "html" not in response.headers.get("content-type", "html"):
+            return str(response.url), None
+        
+        return str(response.url), response.text
+    
+    async def _wait_for_host(self, url: str):
+        """Space requests to one host at least request_delay seconds apart."""
+        if not self.request_delay:
+            return
+        
+        host = urlparse(url).netloc
+        now = asyncio.get_running_loop().time()
+        # Reserve the slot before sleeping so concurrent fetches queue up behind it
+        start = max(now, self._next_request_at.get(host, now))
+        self._next_request_at[host] = start + self.request_delay
+        if start > now:
+            await asyncio.sleep(start - now)
+    
     def create_selectors_from_goal(self, goal: str) -> Dict[str, str]:
         """
         Create basic selectors based on goal (simplified heuristic).
@@ -187,37 +334,105 @@ class DOMCrawler:
         Returns:
             Dictionary of selectors
         """
+        goal_lower = goal.lower()
         selectors = {}
         
-        # Basic heuristics for common goals
-        if "price" in goal.lower() or "laptop" in goal.lower():
-            selectors["prices"] = ".price, .product-price, [class*='price']"
-            selectors["products"] = ".product-name, .product-title, h2.title"
-        
-        if "login" in goal.lower():
-            selectors["login_button"] = "button[type='submit'], input[type='submit']"
-            selectors["forms"] = "form"
-        
-        if "article" in goal.lower() or "content" in goal.lower():
-            selectors["articles"] = "article, .article, .post"
-            selectors["headings"] = "h1, h2, h3"
+        for keywords, rule_selectors in _GOAL_RULES:
+            if any(keyword in goal_lower for keyword in keywords):
+                selectors.update(rule_selectors)
         
         # Default: collect all links and text
         if not selectors:
-            selectors["links"] = "a::attr(href)"
-            selectors["text"] = "p::text"
+            selectors.update(_DEFAULT_SELECTORS)
         
         return selectors
 
 
+# Stylesheets and fonts extraction never reads, blocked over CDP
+# (images are already off via --blink-settings); "?*" variants catch versioned
+# URLs such as style.css?v=3
+BLOCKED_URL_PATTERNS = [
+    "*.css", "*.css?*",
+    "*.woff", "*.woff?*",
+    "*.woff2", "*.woff2?*",
+    "*.ttf", "*.ttf?*",
+    "*.otf", "*.otf?*",
+    "*.eot", "*.eot?*",
+]
+
+# Runs every CSS selector in-page so extraction costs one WebDriver round-trip;
+# e.href is the absolute URL, as WebElement.get_attribute('href') returns
+_EXTRACT_SCRIPT = """
+const out = {};
+for (const [key, selector] of Object.entries(arguments[0])) {
+    try {
+        out[key] = Array.from(document.querySelectorAll(selector),
+            e => e.innerText || e.href);
+    } catch (e) {
+        out[key] = null;
+    }
+}
+return out;
+"""
+
+
 class SimpleSeleniumCrawler:
     """
     Alternative simple crawler using Selenium for better JavaScript support.
+    
+    The Chrome driver is started on first use and reused by later crawls;
+    call close() or use the crawler as a context manager to quit it.
+    
+    Stylesheets are not loaded, so text that a site's CSS would hide (menus,
+    modals, display:none blocks) is visible to innerText and gets extracted.
     """
     
     def __init__(self, headless: bool = True):
         """Initialize Selenium-based crawler."""
         self.headless = headless
+        self._driver = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __del__(self):
+        self.close()
+    
+    def close(self):
+        """Quit the Chrome driver if one was started."""
+        driver, self._driver = getattr(self, "_driver", None), None
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+    
+    def _get_driver(self):
+        """Return the shared Chrome driver, starting it on first use."""
+        if self._driver is None:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            
+            # Setup Chrome options
+            chrome_options = Options()
+            if self.headless:
+                chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--disable-extensions")
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            
+            self._driver = webdriver.Chrome(options=chrome_options)
+            self._driver.implicitly_wait(5)
+            # Only text and attributes are extracted, so skip fetching assets
+            self._driver.execute_cdp_cmd("Network.enable", {})
+            self._driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        
+        return self._driver
     
     def crawl(self, url: str, goal: str, selectors: Dict[str, str]) -> Dict:
         """
@@ -231,43 +446,52 @@ class SimpleSeleniumCrawler:
         Returns:
             Crawl results
         """
-        from selenium import webdriver
+        from selenium.common.exceptions import InvalidSelectorException
         from selenium.webdriver.common.by import By
-        from selenium.webdriver.chrome.options import Options
         
-        start_time = datetime.now()
-        
-        # Setup Chrome options
-        chrome_options = Options()
-        if self.headless:
-            chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
+        start_time = time.monotonic()
         
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = self._get_driver()
+            # Isolate crawls from each other without restarting Chrome
+            driver.delete_all_cookies()
             driver.get(url)
-            driver.implicitly_wait(5)
             
-            extracted_data = []
+            # Plain CSS runs in-page in a single script call; only XPath and
+            # pseudo-element selectors need the page source
+            plan = _plan_selectors(selectors)
+            in_page = {key: selector for key, engine, selector in plan if engine == _LEXBOR}
             
-            # Extract data using selectors
-            for key, selector in selectors.items():
+            fields = {}
+            if in_page:
+                # The script skips the driver's implicit wait, so let nodes
+                # rendered late by JS appear first
                 try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    values = [elem.text or elem.get_attribute("href") for elem in elements]
-                    
-                    if values:
-                        extracted_data.append({
-                            "field": key,
-                            "values": values,
-                            "url": url
-                        })
-                except Exception as e:
-                    print(f"Error extracting {key}: {e}")
+                    driver.find_elements(By.CSS_SELECTOR, next(iter(in_page.values())))
+                except InvalidSelectorException:
+                    pass  # reported per field below
+                found = driver.execute_script(_EXTRACT_SCRIPT, in_page)
+                for key, values in found.items():
+                    if values is None:
+                        print(f"Error extracting {key}: invalid selector {in_page[key]!r}")
+                    elif values:
+                        fields[key] = values
+            
+            rest = [entry for entry in plan if entry[1] != _LEXBOR]
+            if rest:
+                fields.update(_extract_fields(driver.page_source, rest))
             
+            # Same one-record-per-page shape as DOMCrawler
+            extracted_data = []
+            if fields:
+                extracted_data.append({
+                    "url": url,
+                    "timestamp": datetime.now().isoformat(),
+                    "fields": fields
+                })
+            
+            duration = time.monotonic() - start_time
             end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
             
             results = {
                 "goal": goal,
@@ -275,18 +499,17 @@ class SimpleSeleniumCrawler:
                 "data_extracted": extracted_data,
                 "duration_seconds": duration,
                 "success": len(extracted_data) > 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": end_time.isoformat()
             }
             
             return results
             
         except Exception as e:
+            # The driver may be unusable; start a fresh one next crawl
+            self.close()
             return {
                 "goal": goal,
                 "url": url,
                 "error": str(e),
                 "success": False
             }
-        
-        finally:
-            driver.quit()
@@ -5,13 +5,16 @@ Streamlit Dashboard for Agentic Web Observer - Live Vision Feed & Metrics
 import streamlit as st
 import json
 import asyncio
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
 from datetime import datetime
 from PIL import Image
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 # Import our modules
 import sys
@@ -31,7 +34,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -54,7 +57,140 @@ st.markdown("""
         color: #dc3545;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _load_screenshot(path: str, mtime: float) -> bytes:
+    """
+    Decode and downscale a screenshot once per file version.
+    
+    Args:
+        path: Screenshot path
+        mtime: Modification time, part of the cache key so rewritten files reload
+        
+    Returns:
+        JPEG bytes ready for st.image
+    """
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        img.thumbnail((1280, 720), Image.BILINEAR)
+        
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=85)
+    
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _list_recent_screenshots(screenshots_dir: str, dir_mtime: float, count: int = 5) -> List[Tuple[str, float]]:
+    """
+    List the newest screenshots once per directory version.
+    
+    Args:
+        screenshots_dir: Directory the agent writes screenshots to
+        dir_mtime: Directory modification time, part of the cache key so new
+            files invalidate the listing
+        count: Number of screenshots to return
+        
+    Returns:
+        (file name, mtime) pairs for the ``count`` most recently written
+        screenshots, oldest first
+    """
+    # By mtime, not name: step_10_... sorts before step_2_...
+    with os.scandir(screenshots_dir) as entries:
+        shots = sorted(
+            (entry.stat().st_mtime, entry.name)
+            for entry in entries if entry.name.endswith((".jpg", ".png"))
+        )[-count:]
+    return [(name, mtime) for mtime, name in shots]
+
+
+# Streamlit serves this directory at app/static/ when static serving is on
+STATIC_DIR = Path(__file__).parent / "static"
+
+
+def _publish_static_screenshots(screenshots_dir: str, names: List[str]) -> bool:
+    """
+    Copy screenshots under the static file server.
+    
+    Streamlit refuses static files whose real path lies outside static/, so
+    the files are copied rather than linked. Unchanged copies are kept and
+    copies no longer listed are removed.
+    
+    Args:
+        screenshots_dir: Directory the agent writes screenshots to
+        names: File names to publish
+        
+    Returns:
+        True if the screenshots can be served as static files
+    """
+    published = STATIC_DIR / "screenshots"
+    
+    try:
+        published.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            source = Path(screenshots_dir) / name
+            copy = published / name
+            if not copy.exists() or copy.stat().st_mtime != source.stat().st_mtime:
+                shutil.copy2(source, copy)  # keeps mtime for the check above
+        for stale in published.iterdir():
+            if stale.name not in names:
+                stale.unlink()
+        return True
+    except OSError:
+        return False
+
+
+@st.cache_resource(show_spinner=False)
+def _get_executor() -> ThreadPoolExecutor:
+    """Thread pool that runs crawls and duels off the Streamlit script thread."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="observer-bg")
+
+
+def _run_navigation(url: str, goal: str, vlm_provider: str, max_steps: int) -> Dict:
+    """Run one navigation on its own event loop (executor thread)."""
+    async def run_crawler():
+        agent = NavigationAgent(
+            vision_provider=vlm_provider,
+            max_steps=max_steps,
+            headless=False
+        )
+        return await agent.navigate(url, goal)
+    
+    return asyncio.run(run_crawler())
+
+
+def _run_duel(url: str, goal: str, vlm_provider: str, selectors: Optional[Dict[str, str]]) -> Dict:
+    """Run one benchmark duel on its own event loop (executor thread)."""
+    async def run():
+        async with BenchmarkRunner(vlm_provider=vlm_provider, max_steps=20) as runner:
+            return await runner.run_duel(url, goal, selectors)
+    
+    return asyncio.run(run())
+
+
+def _collect_future(future_key: str, result_key: str) -> bool:
+    """
+    Move a finished background job's outcome into session state.
+    
+    Args:
+        future_key: Session key holding the Future
+        result_key: Session key that receives the result (or error dict)
+        
+    Returns:
+        True if the job finished during this call
+    """
+    future: Optional[Future] = st.session_state.get(future_key)
+    if future is None or not future.done():
+        return False
+    
+    del st.session_state[future_key]
+    try:
+        st.session_state[result_key] = future.result()
+    except Exception as e:
+        st.session_state[result_key] = {"error": str(e)}
+    return True
 
 
 def initialize_session_state():
@@ -114,6 +250,13 @@ def render_live_vision_feed():
         
         start_crawl = st.button("🚀 Start Crawl", type="primary", use_container_width=True)
     
+    if start_crawl and not st.session_state.live_feed_active:
+        # Crawl in the background so the dashboard stays interactive
+        st.session_state.crawl_future = _get_executor().submit(
+            _run_navigation, url, goal, vlm_provider, max_steps
+        )
+        st.session_state.live_feed_active = True
+    
     with col2:
         st.subheader("Status")
         status_placeholder = st.empty()
@@ -130,49 +273,67 @@ def render_live_vision_feed():
     vision_col1, vision_col2 = st.columns([3, 2])
     
     with vision_col1:
-        screenshot_placeholder = st.empty()
+        if st.session_state.live_feed_active:
+            _poll_live_crawl()
+        else:
+            _render_screenshot_gallery()
+    
+    result = st.session_state.get("last_crawl_result")
     
     with vision_col2:
-        elements_placeholder = st.empty()
-        reasoning_placeholder = st.empty()
+        if result and result.get("error"):
+            st.error(f"Error: {result['error']}")
+        if result and result.get("reasoning"):
+            st.markdown("**Last reasoning**")
+            st.text(result["reasoning"])
     
     # Action history
     st.markdown("---")
     st.subheader("Action History")
-    action_history_placeholder = st.empty()
     
-    if start_crawl and not st.session_state.live_feed_active:
-        st.session_state.live_feed_active = True
-        
-        with st.spinner("Initializing crawler..."):
-            try:
-                # Run the crawler
-                async def run_crawler():
-                    agent = NavigationAgent(
-                        vision_provider=vlm_provider,
-                        max_steps=max_steps,
-                        headless=False
-                    )
-                    return await agent.navigate(url, goal)
-                
-                # Note: In a real implementation, this would need proper async handling
-                # For Streamlit, we'd need to use threading or async execution
-                st.warning("⚠️ Live feed requires async execution. Check screenshots folder for results.")
-                
-                # Show simulated live feed
-                screenshots_dir = Path("screenshots")
-                if screenshots_dir.exists():
-                    screenshots = sorted(screenshots_dir.glob("*.png"))
-                    
-                    if screenshots:
-                        for screenshot in screenshots[-5:]:  # Show last 5
-                            img = Image.open(screenshot)
-                            screenshot_placeholder.image(img, caption=screenshot.name, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
-            finally:
-                st.session_state.live_feed_active = False
+    if result and result.get("action_history"):
+        st.dataframe(pd.DataFrame(result["action_history"]), use_container_width=True, hide_index=True)
+
+
+@st.fragment(run_every=1.0)
+def _poll_live_crawl():
+    """Refresh the feed while the background crawl runs."""
+    if _collect_future("crawl_future", "last_crawl_result"):
+        st.session_state.live_feed_active = False
+        st.rerun()
+    
+    _render_screenshot_gallery()
+
+
+def _render_screenshot_gallery():
+    """Show the most recent screenshots as a single gallery element."""
+    screenshots_dir = Path("screenshots")
+    try:
+        dir_mtime = screenshots_dir.stat().st_mtime
+    except FileNotFoundError:
+        return
+    
+    recent = _list_recent_screenshots(str(screenshots_dir), dir_mtime)  # Show last 5
+    if not recent:
+        return
+    
+    static = _publish_static_screenshots(str(screenshots_dir), [name for name, _ in recent])
+    
+    # Render all five in one element instead of one st.image per file
+    if static:
+        # Browser fetches (and caches) the files directly
+        gallery = "".join(
+            f'<img src="app/static/screenshots/{name}" alt="{name}" '
+            f'title="{name}" style="width:20%;min-width:0">'
+            for name, _ in recent
+        )
+        st.markdown(f'<div style="display:flex;gap:4px">{gallery}</div>', unsafe_allow_html=True)
+    else:
+        st.image(
+            [_load_screenshot(str(screenshots_dir / name), mtime) for name, mtime in recent],
+            caption=[name for name, _ in recent],
+            width=256
+        )
 
 
 def render_benchmark_duel():
@@ -208,56 +369,98 @@ def render_benchmark_duel():
         st.subheader("Quick Stats")
         
         metrics = st.session_state.metrics_tracker
-        comparison = metrics.compare_crawlers()
+        comparison = _summary_stats(*_history_sizes(metrics), metrics)['crawler_comparison']
         
         st.metric("VLM Success Rate", f"{comparison['vlm']['success_rate']:.1%}")
         st.metric("DOM Success Rate", f"{comparison['dom']['success_rate']:.1%}")
         st.metric("Total Duels", comparison['vlm']['count'] + comparison['dom']['count'])
     
-    if st.button("⚔️ Start Duel", type="primary", use_container_width=True):
-        with st.spinner("Running duel..."):
-            try:
-                runner = BenchmarkRunner(
-                    vlm_provider=vlm_provider,
-                    max_steps=20
-                )
-                
-                selectors = {selector_key: selector_value} if selector_key else None
-                
-                # Note: This requires async execution
-                st.warning("⚠️ Duel requires async execution. Check benchmarks folder for results.")
-                
-                # Show last duel result if available
-                benchmarks_dir = Path("benchmarks")
-                if benchmarks_dir.exists():
-                    duel_files = sorted(benchmarks_dir.glob("duel_*.json"))
-                    if duel_files:
-                        with open(duel_files[-1], 'r') as f:
-                            last_duel = json.load(f)
-                        
-                        st.markdown("---")
-                        st.subheader("Latest Duel Results")
-                        
-                        result_col1, result_col2 = st.columns(2)
-                        
-                        with result_col1:
-                            st.markdown("### 🤖 VLM Crawler")
-                            vlm = last_duel['vlm_results']
-                            st.write(f"✅ Success: {vlm.get('success', False)}")
-                            st.write(f"⏱️ Duration: {vlm.get('duration', 0):.2f}s")
-                            st.write(f"📊 Steps: {vlm.get('steps', 0)}")
-                        
-                        with result_col2:
-                            st.markdown("### 🔍 DOM Crawler")
-                            dom = last_duel['dom_results']
-                            st.write(f"✅ Success: {dom.get('success', False)}")
-                            st.write(f"⏱️ Duration: {dom.get('duration', 0):.2f}s")
-                            st.write(f"📊 Data Points: {len(dom.get('data_extracted', []))}")
-                        
-                        st.markdown(f"### 🏆 Winner: {last_duel['comparison']['winner']}")
-                
-            except Exception as e:
-                st.error(f"Error running duel: {str(e)}")
+    duel_running = "duel_future" in st.session_state
+    
+    if st.button("⚔️ Start Duel", type="primary", use_container_width=True, disabled=duel_running):
+        selectors = {selector_key: selector_value} if selector_key else None
+        
+        # Duel in the background so the dashboard stays interactive
+        st.session_state.duel_future = _get_executor().submit(
+            _run_duel, url, goal, vlm_provider, selectors
+        )
+        duel_running = True
+    
+    if duel_running:
+        _poll_duel()
+        return
+    
+    last_duel = st.session_state.get("last_duel_result")
+    if last_duel and last_duel.get("error"):
+        st.error(f"Error running duel: {last_duel['error']}")
+        last_duel = None
+    
+    # Fall back to the last duel saved by any run
+    if last_duel is None:
+        last_duel = _load_latest_duel()
+    
+    if last_duel:
+        _render_duel_results(last_duel)
+
+
+@st.fragment(run_every=1.0)
+def _poll_duel():
+    """Wait for the background duel, then rerun to show its results."""
+    if _collect_future("duel_future", "last_duel_result"):
+        # The duel recorded through its own tracker; reload to pick those records up
+        st.session_state.metrics_tracker.close()
+        st.session_state.metrics_tracker = MetricsTracker()
+        st.rerun()
+    
+    st.info("⏳ Duel in progress...")
+
+
+def _load_latest_duel() -> Optional[Dict]:
+    """Load the most recently written duel file, if any."""
+    benchmarks_dir = Path("benchmarks")
+    if not benchmarks_dir.exists():
+        return None
+    
+    duel_files = list(benchmarks_dir.glob("duel_*.json"))
+    if not duel_files:
+        return None
+    
+    latest_duel = max(duel_files, key=lambda p: p.stat().st_mtime)
+    with open(latest_duel, 'r') as f:
+        return json.load(f)
+
+
+def _render_duel_results(last_duel: Dict):
+    """Show one duel's side-by-side results."""
+    st.markdown("---")
+    st.subheader("Latest Duel Results")
+    
+    result_col1, result_col2 = st.columns(2)
+    
+    with result_col1:
+        st.markdown("### 🤖 VLM Crawler")
+        vlm = last_duel['vlm_results']
+        st.write(f"✅ Success: {vlm.get('success', False)}")
+        st.write(f"⏱️ Duration: {vlm.get('duration', 0):.2f}s")
+        st.write(f"📊 Steps: {vlm.get('steps', 0)}")
+    
+    with result_col2:
+        st.markdown("### 🔍 DOM Crawler")
+        dom = last_duel['dom_results']
+        st.write(f"✅ Success: {dom.get('success', False)}")
+        st.write(f"⏱️ Duration: {dom.get('duration', 0):.2f}s")
+        st.write(f"📊 Data Points: {sum(len(page['fields']) for page in dom.get('data_extracted', []))}")
+    
+    st.markdown(f"### 🏆 Winner: {last_duel['comparison']['winner']}")
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _comparison_frame(label: str, vlm_value: float, dom_value: float, colors: Tuple[str, str]) -> pd.DataFrame:
+    """Two-bar VLM vs DOM frame for st.bar_chart, built once per value pair."""
+    return pd.DataFrame(
+        {label: [vlm_value, dom_value], "color": list(colors)},
+        index=["VLM", "DOM"]
+    )
 
 
 def render_metrics_dashboard():
@@ -270,7 +473,8 @@ def render_metrics_dashboard():
     st.subheader("Overview")
     col1, col2, col3, col4 = st.columns(4)
     
-    summary = metrics.get_summary_stats()
+    summary = _summary_stats(*_history_sizes(metrics), metrics)
+    comparison = summary['crawler_comparison']
     
     with col1:
         st.metric("Total Crawls", summary['total_crawls'])
@@ -279,7 +483,6 @@ def render_metrics_dashboard():
     with col3:
         st.metric("Resilience Tests", summary['total_resilience_tests'])
     with col4:
-        comparison = summary['crawler_comparison']
         vlm_avg_dur = comparison['vlm']['avg_duration']
         st.metric("Avg Duration (VLM)", f"{vlm_avg_dur:.2f}s")
     
@@ -291,56 +494,36 @@ def render_metrics_dashboard():
     with col1:
         st.subheader("Success Rate Comparison")
         
-        comparison = metrics.compare_crawlers()
-        
-        fig = go.Figure(data=[
-            go.Bar(
-                name='Success Rate',
-                x=['VLM', 'DOM'],
-                y=[
-                    comparison['vlm']['success_rate'] * 100,
-                    comparison['dom']['success_rate'] * 100
-                ],
-                marker_color=['#667eea', '#764ba2']
-            )
-        ])
-        
-        fig.update_layout(
-            yaxis_title="Success Rate (%)",
-            yaxis_range=[0, 100],
-            showlegend=False
+        st.bar_chart(
+            _comparison_frame(
+                "Success Rate (%)",
+                comparison['vlm']['success_rate'] * 100,
+                comparison['dom']['success_rate'] * 100,
+                ("#667eea", "#764ba2")
+            ),
+            y="Success Rate (%)",
+            color="color"
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("Resilience Score Comparison")
         
-        fig = go.Figure(data=[
-            go.Bar(
-                name='Resilience',
-                x=['VLM', 'DOM'],
-                y=[
-                    comparison['vlm']['avg_resilience'] * 100,
-                    comparison['dom']['avg_resilience'] * 100
-                ],
-                marker_color=['#28a745', '#ffc107']
-            )
-        ])
-        
-        fig.update_layout(
-            yaxis_title="Resilience Score (%)",
-            yaxis_range=[0, 100],
-            showlegend=False
+        st.bar_chart(
+            _comparison_frame(
+                "Resilience Score (%)",
+                comparison['vlm']['avg_resilience'] * 100,
+                comparison['dom']['avg_resilience'] * 100,
+                ("#28a745", "#ffc107")
+            ),
+            y="Resilience Score (%)",
+            color="color"
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
     
     # Cost analysis
     st.markdown("---")
     st.subheader("Cost Analysis (VLM)")
     
-    cost_metrics = metrics.calculate_cost_efficiency('vlm')
+    cost_metrics = comparison['vlm']['cost_metrics']
     
     cost_col1, cost_col2, cost_col3 = st.columns(3)
     
@@ -356,26 +539,63 @@ def render_metrics_dashboard():
     st.subheader("Recent Crawls")
     
     if metrics.metrics_history:
-        recent_crawls = metrics.metrics_history[-10:]  # Last 10
-        
-        df = pd.DataFrame([
-            {
-                "Type": m.crawler_type.upper(),
-                "Goal": m.goal[:40] + "..." if len(m.goal) > 40 else m.goal,
-                "Success": "✅" if m.success else "❌",
-                "Duration": f"{m.duration_seconds:.2f}s",
-                "Pages": m.pages_visited,
-                "Cost": f"${m.cost_usd:.4f}",
-                "Time": datetime.fromisoformat(m.timestamp).strftime("%Y-%m-%d %H:%M")
-            }
-            for m in reversed(recent_crawls)
-        ])
+        df = _recent_crawls_frame(len(metrics.metrics_history), metrics)
         
         st.dataframe(df, use_container_width=True, hide_index=True)
     else:
         st.info("No crawl history yet. Run some crawls to see metrics!")
 
 
+def _history_sizes(metrics: MetricsTracker) -> tuple:
+    """Crawl and resilience record counts, used as cache keys."""
+    return len(metrics.metrics_history), len(metrics.resilience_history)
+
+
+@st.cache_data(ttl=2, show_spinner=False)
+def _summary_stats(crawl_count: int, resilience_count: int, _metrics: MetricsTracker) -> Dict:
+    """
+    Summary statistics, shared by every panel in a rerun.
+    
+    Args:
+        crawl_count: Number of recorded crawls (cache key)
+        resilience_count: Number of resilience tests (cache key)
+        _metrics: Metrics tracker (unhashed)
+        
+    Returns:
+        MetricsTracker.get_summary_stats() output
+    """
+    return _metrics.get_summary_stats()
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _recent_crawls_frame(history_len: int, _metrics: MetricsTracker) -> pd.DataFrame:
+    """
+    Build the Recent Crawls table, rebuilt only when the history grows.
+    
+    Args:
+        history_len: Number of recorded crawls, the cache key
+        _metrics: Metrics tracker (unhashed)
+        
+    Returns:
+        Table of the last 10 crawls, newest first
+    """
+    recent_crawls = _metrics.metrics_history[-10:][::-1]  # Last 10
+    
+    # One list per column so pandas builds each column in one go
+    return pd.DataFrame({
+        "Type": [m.crawler_type.upper() for m in recent_crawls],
+        "Goal": [m.goal[:40] + "..." if len(m.goal) > 40 else m.goal for m in recent_crawls],
+        "Success": ["✅" if m.success else "❌" for m in recent_crawls],
+        "Duration": [f"{m.duration_seconds:.2f}s" for m in recent_crawls],
+        "Pages": [m.pages_visited for m in recent_crawls],
+        "Cost": [f"${m.cost_usd:.4f}" for m in recent_crawls],
+        "Time": [
+            datetime.fromisoformat(m.timestamp).strftime("%Y-%m-%d %H:%M")
+            for m in recent_crawls
+        ]
+    })
+
+
 def render_configure():
     """Render configuration page."""
     st.header("⚙️ Configuration")
@@ -429,12 +649,13 @@ def render_configure():
     - Python, Playwright, LangChain/LangGraph
     - OpenAI GPT-4o / Google Gemini
     - Streamlit, Plotly
-    - Scrapy, Beautiful Soup
+    - httpx, selectolax, Selenium
     """)
 
 
 def main():
     """Main application."""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
     initialize_session_state()
     render_header()
     
@@ -2,23 +2,83 @@
 Autonomous Navigation Agent using LangGraph for goal-based web navigation.
 """
 
+import hashlib
+import io
 import os
+import re
 import asyncio
-from typing import Dict, List, Optional, TypedDict, Annotated
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple, TypedDict, Annotated
 from pathlib import Path
+from urllib.parse import urlparse
 from datetime import datetime
-from playwright.async_api import async_playwright, Page, Browser
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
+from PIL import Image
 
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from ..vision_engine import VisionEngine, DetectedElement
 
+try:
+    import imagehash
+except ImportError:  # optional, DCT-based perceptual hash
+    imagehash = None
+
 load_dotenv()
 
+# Analyses kept per agent for near-identical screenshots
+_VLM_CACHE_SIZE = 256
+
+# "ELEMENT_INDEX: 3" / "STATUS: continue" lines of the reasoning response
+_REASONING_FIELD_RE = re.compile(r"^\s*(ELEMENT_INDEX|STATUS):\s*(-?\w+)", re.MULTILINE)
+_REQUIRED_REASONING_FIELDS = {"ELEMENT_INDEX", "STATUS"}
+
+# Requests aborted when heavy resources are disabled
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+_TRACKER_DOMAINS = (
+    "doubleclick.net",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "facebook.net",
+    "hotjar.com",
+)
+
+
+def _screenshot_hash(screenshot: bytes) -> int:
+    """
+    64-bit hash of a screenshot for the analysis cache.
+    
+    With imagehash installed this is a pHash, so visually identical pages
+    (re-renders, hover states, JPEG noise) hash the same. Otherwise it is an
+    exact digest: a coarser hash would match pages that only share a layout.
+    """
+    if imagehash is None:
+        return int.from_bytes(hashlib.blake2b(screenshot, digest_size=8).digest(), "big")
+    
+    with Image.open(io.BytesIO(screenshot)) as image:
+        # JPEG decodes straight to a small grayscale image
+        image.draft("L", (64, 64))
+        return int(str(imagehash.phash(image)), 16)
+
+
+async def _block_heavy_requests(route):
+    """Abort image/font/media and tracker requests; let everything else through."""
+    request = route.request
+    host = urlparse(request.url).hostname or ""
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES or host.endswith(_TRACKER_DOMAINS):
+        await route.abort()
+    else:
+        await route.continue_()
+
 
 class NavigationState(TypedDict):
     """State for the navigation agent."""
@@ -32,11 +92,30 @@ class NavigationState(TypedDict):
     completed: bool
     error: Optional[str]
     reasoning: str
+    token_usage: Dict[str, int]
+
+
+def _agent_node(method_name: str):
+    """Wrap an agent node method so the graph can be compiled once per class."""
+    async def node(state: NavigationState, config: RunnableConfig) -> NavigationState:
+        agent = config["configurable"]["agent"]
+        return await getattr(agent, method_name)(state)
+    
+    node.__name__ = method_name
+    return node
+
+
+def _should_continue(state: NavigationState, config: RunnableConfig) -> str:
+    """Route via the running agent's should_continue."""
+    return config["configurable"]["agent"].should_continue(state)
 
 
 class NavigationAgent:
     """
     Autonomous navigation agent that uses VLM and LangGraph for web navigation.
+    
+    Use as an async context manager to keep one browser running across
+    several navigate() calls; each call then only opens a fresh context.
     """
     
     def __init__(
@@ -45,7 +124,13 @@ class NavigationAgent:
         vision_model: str = "gpt-4o",
         llm_provider: str = "openai",
         max_steps: int = 20,
-        headless: bool = False
+        headless: bool = False,
+        browser: Optional[Browser] = None,
+        vision_cache_dir: Optional[str] = None,
+        png_screenshots: bool = False,
+        image_detail: str = "low",
+        max_wait_ms: int = 3000,
+        disable_images: bool = False
     ):
         """
         Initialize the Navigation Agent.
@@ -56,10 +141,28 @@ class NavigationAgent:
             llm_provider: LLM provider for reasoning
             max_steps: Maximum navigation steps
             headless: Whether to run browser in headless mode
+            browser: Optional already-launched browser to share; the agent
+                only opens a fresh context on it and never closes it
+            vision_cache_dir: Optional directory for caching VLM responses
+            png_screenshots: Save lossless PNG screenshots instead of the
+                smaller, faster quality-60 JPEGs
+            image_detail: OpenAI image detail for screenshots; 'low' uploads
+                at most 512px per step, 'high' trades tokens for precision
+            max_wait_ms: Upper bound on waiting for the page to settle after
+                an action
+            disable_images: Abort image, font, media and tracker requests for
+                faster loads; screenshots then show blank image slots
         """
-        self.vision_engine = VisionEngine(vision_provider, vision_model)
+        self.vision_engine = VisionEngine(
+            vision_provider,
+            vision_model,
+            cache_dir=vision_cache_dir,
+            image_detail=image_detail
+        )
         self.max_steps = max_steps
         self.headless = headless
+        self.max_wait_ms = max_wait_ms
+        self.disable_images = disable_images
         
         # Setup LLM for reasoning
         if llm_provider == "openai":
@@ -75,29 +178,54 @@ class NavigationAgent:
                 google_api_key=os.getenv("GOOGLE_API_KEY")
             )
         
-        # Build the LangGraph workflow
-        self.workflow = self._build_workflow()
-        self.app = self.workflow.compile()
+        # The compiled LangGraph workflow is shared by every agent of this class
+        self.workflow, self.app = type(self)._get_compiled_workflow()
         
         # Browser and page instances
-        self.browser: Optional[Browser] = None
+        self.browser: Optional[Browser] = browser
+        self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
         self.playwright_instance = None
+        self._owns_browser = browser is None
+        # Set inside ``async with`` so navigate() leaves the browser running
+        self._keep_browser = False
+        
+        # Latest screenshot bytes, handed from capture_screen_node to analyze_elements_node
+        self._screenshot: Optional[bytes] = None
+        # (screenshot hash, page URL, goal) -> elements, oldest first
+        self._vlm_cache: "OrderedDict[Tuple[int, str, str], List[DetectedElement]]" = OrderedDict()
+        # Background screenshot file writes, awaited before navigate() returns
+        self._pending_writes: set = set()
         
         # Create screenshots directory
         self.screenshots_dir = Path("screenshots")
         self.screenshots_dir.mkdir(exist_ok=True)
+        self.png_screenshots = png_screenshots
+    
+    @classmethod
+    def _get_compiled_workflow(cls):
+        """Build and compile the workflow once per class, on first use."""
+        if "_compiled_workflow" not in cls.__dict__:
+            workflow = cls._build_workflow()
+            cls._compiled_workflow = (workflow, workflow.compile())
+        return cls._compiled_workflow
     
-    def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow for navigation."""
+    @classmethod
+    def _build_workflow(cls) -> StateGraph:
+        """
+        Build the LangGraph workflow for navigation.
+        
+        Nodes look up the running agent in the ``configurable`` config that
+        navigate() passes, so one compiled graph serves every instance.
+        """
         workflow = StateGraph(NavigationState)
         
         # Define nodes
-        workflow.add_node("capture_screen", self.capture_screen_node)
-        workflow.add_node("analyze_elements", self.analyze_elements_node)
-        workflow.add_node("reason_action", self.reason_action_node)
-        workflow.add_node("execute_action", self.execute_action_node)
-        workflow.add_node("check_completion", self.check_completion_node)
+        workflow.add_node("capture_screen", _agent_node("capture_screen_node"))
+        workflow.add_node("analyze_elements", _agent_node("analyze_elements_node"))
+        workflow.add_node("reason_action", _agent_node("reason_action_node"))
+        workflow.add_node("execute_action", _agent_node("execute_action_node"))
+        workflow.add_node("check_completion", _agent_node("check_completion_node"))
         
         # Define edges
         workflow.set_entry_point("capture_screen")
@@ -109,7 +237,7 @@ class NavigationAgent:
         # Conditional edge from check_completion
         workflow.add_conditional_edges(
             "check_completion",
-            self.should_continue,
+            _should_continue,
             {
                 "continue": "capture_screen",
                 "end": END
@@ -118,57 +246,127 @@ class NavigationAgent:
         
         return workflow
     
+    async def __aenter__(self):
+        await self._ensure_browser()
+        self._keep_browser = True
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._keep_browser = False
+        await self.vision_engine.aclose()
+        await self.close_browser()
+    
+    async def _ensure_browser(self):
+        """Launch the browser unless one is already running or was shared."""
+        if self.browser is None:
+            self.playwright_instance = await async_playwright().start()
+            self.browser = await self.playwright_instance.chromium.launch(headless=self.headless)
+    
     async def initialize_browser(self, url: str):
         """Initialize Playwright browser."""
-        self.playwright_instance = await async_playwright().start()
-        self.browser = await self.playwright_instance.chromium.launch(headless=self.headless)
-        context = await self.browser.new_context(
+        # Launching chromium is expensive; a running browser only needs a new context
+        await self._ensure_browser()
+        self.context = await self.browser.new_context(
             viewport={"width": 1280, "height": 720},
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         )
-        self.page = await context.new_page()
+        if self.disable_images:
+            await self.context.route("**/*", _block_heavy_requests)
+        self.page = await self.context.new_page()
         await self.page.goto(url, wait_until="networkidle", timeout=30000)
     
     async def close_browser(self):
         """Close Playwright browser."""
         if self.page:
             await self.page.close()
+            self.page = None
+        if self.context:
+            await self.context.close()
+            self.context = None
+        
+        # Leave a shared browser running for its owner, and keep our own
+        # running between navigations inside ``async with``
+        if not self._owns_browser or self._keep_browser:
+            return
+        
         if self.browser:
             await self.browser.close()
+            self.browser = None
         if self.playwright_instance:
             await self.playwright_instance.stop()
+            self.playwright_instance = None
     
     async def capture_screen_node(self, state: NavigationState) -> NavigationState:
         """Node to capture screenshot of current page."""
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_path = str(self.screenshots_dir / f"step_{state['step_count']}_{timestamp}.png")
             
-            await self.page.screenshot(path=screenshot_path, full_page=False)
+            if self.png_screenshots:
+                screenshot_path = str(self.screenshots_dir / f"step_{state['step_count']}_{timestamp}.png")
+                shot = await self.page.screenshot(full_page=False)
+            else:
+                # JPEG encodes far faster than PNG and is a fraction of the size
+                screenshot_path = str(self.screenshots_dir / f"step_{state['step_count']}_{timestamp}.jpg")
+                shot = await self.page.screenshot(type="jpeg", quality=60, full_page=False)
+            
+            # The VLM gets the bytes directly; the file is only for the dashboard
+            write = asyncio.create_task(asyncio.to_thread(Path(screenshot_path).write_bytes, shot))
+            self._pending_writes.add(write)
+            write.add_done_callback(self._pending_writes.discard)
             
             state["screenshot_path"] = screenshot_path
             state["current_url"] = self.page.url
-            
+            self._screenshot = shot
+        
         except Exception as e:
             state["error"] = f"Screenshot capture error: {str(e)}"
         
         return state
     
+    async def _analyze_screenshot(
+        self,
+        screenshot: bytes,
+        url: str,
+        goal: str,
+        context: str
+    ) -> List[DetectedElement]:
+        """Analyze a screenshot, reusing the result for the same page looking the same."""
+        key = (await asyncio.to_thread(_screenshot_hash, screenshot), url, goal)
+        if key in self._vlm_cache:
+            return self._vlm_cache[key]
+        
+        elements = await self.vision_engine.analyze_screenshot_bytes(screenshot, goal, context)
+        
+        # Failed calls return an empty list and are not worth caching
+        if elements:
+            self._vlm_cache[key] = elements
+            if len(self._vlm_cache) > _VLM_CACHE_SIZE:
+                self._vlm_cache.popitem(last=False)
+        return elements
+    
     async def analyze_elements_node(self, state: NavigationState) -> NavigationState:
         """Node to analyze screenshot and detect elements."""
         try:
+            shot, self._screenshot = self._screenshot, None
+            if shot is None:
+                raise RuntimeError("no screenshot captured")
+            
             context = f"Step {state['step_count']}/{state['max_steps']}"
             if state.get("action_history"):
                 last_action = state["action_history"][-1]
                 context += f" | Last action: {last_action.get('action_type', 'none')}"
             
-            detected_elements = self.vision_engine.analyze_screenshot(
-                state["screenshot_path"],
-                state["goal"],
-                context
-            )
+            # The screenshot file write runs in the background meanwhile
+            elements = await self._analyze_screenshot(shot, self.page.url, state["goal"], context)
             
-            state["detected_elements"] = detected_elements
+            # Every element's click point in one pass, rather than per action
+            centers = self.vision_engine.calculate_click_coordinates_batch(
+                [element.bounding_box for element in elements]
+            )
+            state["detected_elements"] = [
+                replace(element, center=(x, y))
+                for element, (x, y) in zip(elements, centers.tolist())
+            ]
             
         except Exception as e:
             state["error"] = f"Element analysis error: {str(e)}"
@@ -217,8 +415,18 @@ REASONING: <your reasoning>
                 HumanMessage(content=prompt)
             ]
             
-            response = await asyncio.to_thread(self.llm.invoke, messages)
-            reasoning = response.content
+            # Stop streaming once ELEMENT_INDEX and STATUS are in; the
+            # REASONING trailer is not needed to act. aclosing() closes the
+            # HTTP stream on break instead of leaving it to garbage collection
+            reasoning = ""
+            async with aclosing(self.llm.astream(messages)) as stream:
+                async for chunk in stream:
+                    reasoning += chunk.content
+                    # Only look at finished lines so "STATUS: cont" isn't read early
+                    complete = reasoning[:reasoning.rfind("\n") + 1]
+                    found = {match[1] for match in _REASONING_FIELD_RE.finditer(complete)}
+                    if found >= _REQUIRED_REASONING_FIELDS:
+                        break
             
             state["reasoning"] = reasoning
             
@@ -234,17 +442,16 @@ REASONING: <your reasoning>
             reasoning = state.get("reasoning", "")
             
             # Parse reasoning to get element index and status
-            element_index = -1
-            status = "continue"
+            fields = {
+                match[1]: match[2]
+                for match in _REASONING_FIELD_RE.finditer(reasoning)
+            }
             
-            for line in reasoning.split("\n"):
-                if line.startswith("ELEMENT_INDEX:"):
-                    try:
-                        element_index = int(line.split(":")[1].strip())
-                    except (ValueError, IndexError):
-                        pass
-                elif line.startswith("STATUS:"):
-                    status = line.split(":")[1].strip().lower()
+            try:
+                element_index = int(fields.get("ELEMENT_INDEX", -1))
+            except ValueError:
+                element_index = -1
+            status = fields.get("STATUS", "continue").lower()
             
             # Check if we should stop
             if status in ["achieved", "failed"]:
@@ -255,25 +462,36 @@ REASONING: <your reasoning>
             if 0 <= element_index < len(state["detected_elements"]):
                 element = state["detected_elements"][element_index]
                 
-                # Calculate click coordinates
-                click_x, click_y = self.vision_engine.calculate_click_coordinates(
+                # Click point precomputed in analyze_elements_node
+                click_x, click_y = element.center or self.vision_engine.calculate_click_coordinates(
                     element.bounding_box
                 )
                 
                 # Perform action
                 if element.action == "click":
-                    await self.page.mouse.click(click_x, click_y)
-                    await self.page.wait_for_timeout(2000)  # Wait for page to load
+                    # The current page is already idle, so wait for the navigation
+                    # the click starts, not the load state
+                    try:
+                        async with self.page.expect_navigation(
+                            wait_until="networkidle", timeout=self.max_wait_ms
+                        ):
+                            await self.page.mouse.click(click_x, click_y)
+                    except PlaywrightTimeoutError:
+                        pass  # the click did not navigate, or the page never went idle
                 
                 elif element.action == "type":
                     # For input fields, click and type
                     await self.page.mouse.click(click_x, click_y)
-                    await self.page.wait_for_timeout(500)
+                    await self._wait_until(self.page.wait_for_function(
+                        "document.activeElement && document.activeElement !== document.body",
+                        timeout=min(500, self.max_wait_ms)
+                    ))
                     # Would need input text - for now just click
                 
                 elif element.action == "scroll":
                     await self.page.mouse.wheel(0, 500)
-                    await self.page.wait_for_timeout(1000)
+                    # No event marks the end of a scroll; settle briefly
+                    await self.page.wait_for_timeout(min(500, self.max_wait_ms))
                 
                 # Record action
                 action_record = {
@@ -296,6 +514,13 @@ REASONING: <your reasoning>
         
         return state
     
+    async def _wait_until(self, condition):
+        """Await a Playwright wait, treating a timeout as 'settled enough'."""
+        try:
+            await condition
+        except PlaywrightTimeoutError:
+            pass
+    
     async def check_completion_node(self, state: NavigationState) -> NavigationState:
         """Node to check if navigation should continue."""
         # Check if max steps reached
@@ -327,6 +552,9 @@ REASONING: <your reasoning>
         Returns:
             Final navigation state
         """
+        # Token usage is reported per navigation
+        self.vision_engine.token_usage = {"prompt": 0, "completion": 0}
+        
         try:
             # Initialize browser
             await self.initialize_browser(url)
@@ -345,11 +573,13 @@ REASONING: <your reasoning>
                 "reasoning": ""
             }
             
-            # Run the workflow
+            # Run the workflow, streaming full state values after each node
             final_state = None
-            async for state in self.app.astream(initial_state):
+            config = {"configurable": {"agent": self}}
+            async for state in self.app.astream(initial_state, config, stream_mode="values"):
                 final_state = state
             
+            final_state["token_usage"] = dict(self.vision_engine.token_usage)
             return final_state
             
         except Exception as e:
@@ -359,8 +589,15 @@ REASONING: <your reasoning>
                 "error": f"Navigation error: {str(e)}",
                 "completed": True,
                 "step_count": 0,
-                "action_history": []
+                "action_history": [],
+                "token_usage": dict(self.vision_engine.token_usage)
             }
         
         finally:
+            self._screenshot = None
+            if self._pending_writes:
+                await asyncio.gather(*self._pending_writes, return_exceptions=True)
+            # Inside ``async with`` the VLM connection pool is kept for the next navigation
+            if not self._keep_browser:
+                await self.vision_engine.aclose()
             await self.close_browser()
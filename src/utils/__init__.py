@@ -2,7 +2,9 @@
 
 from .helpers import (
     load_config,
+    reload_config,
     setup_directories,
+    run_async,
     validate_api_keys,
     format_duration,
     truncate_text
@@ -10,7 +12,9 @@ from .helpers import (
 
 __all__ = [
     'load_config',
+    'reload_config',
     'setup_directories',
+    'run_async',
     'validate_api_keys',
     'format_duration',
     'truncate_text'
@@ -1,18 +1,19 @@
 """Utility functions for the Agentic Web Observer."""
 
+import asyncio
+import functools
 import os
-from pathlib import Path
-from typing import Dict, Any
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Coroutine, TypeVar
 
+T = TypeVar("T")
 
-def load_config() -> Dict[str, Any]:
-    """
-    Load configuration from environment variables.
-    
-    Returns:
-        Configuration dictionary
-    """
+
+@functools.lru_cache(maxsize=1)
+def _read_config() -> Dict[str, Any]:
+    """Read the environment once; load_config() hands out copies."""
+    # Imported on first use, not with the package
+    from dotenv import load_dotenv
     load_dotenv()
     
     return {
@@ -20,6 +21,7 @@ def load_config() -> Dict[str, Any]:
         "google_api_key": os.getenv("GOOGLE_API_KEY"),
         "vlm_provider": os.getenv("VLM_PROVIDER", "openai"),
         "vlm_model": os.getenv("VLM_MODEL", "gpt-4o"),
+        "vlm_api_url": os.getenv("VLM_API_URL") or None,
         "max_navigation_steps": int(os.getenv("MAX_NAVIGATION_STEPS", "20")),
         "screenshot_quality": os.getenv("SCREENSHOT_QUALITY", "high"),
         "timeout_seconds": int(os.getenv("TIMEOUT_SECONDS", "30")),
@@ -28,17 +30,70 @@ def load_config() -> Dict[str, Any]:
     }
 
 
+def load_config() -> Dict[str, Any]:
+    """
+    Load configuration from environment variables.
+    
+    The .env file is read once per process; call reload_config() to pick up
+    later changes. Each call returns a fresh copy, so callers may modify it.
+    
+    Returns:
+        Configuration dictionary
+    """
+    return dict(_read_config())
+
+
+def reload_config() -> Dict[str, Any]:
+    """
+    Discard the cached configuration and load it again.
+    
+    Returns:
+        Configuration dictionary
+    """
+    _read_config.cache_clear()
+    return load_config()
+
+
+# Directories created by setup_directories()
+APP_DIRECTORIES = ("screenshots", "data", "benchmarks", "logs")
+
+
 def setup_directories():
-    """Create necessary directories for the application."""
-    directories = [
-        "screenshots",
-        "data",
-        "benchmarks",
-        "logs"
-    ]
+    """
+    Create necessary directories for the application.
+    
+    Not cached: makedirs with exist_ok is cheap, and a directory deleted
+    while running (e.g. screenshots/ cleared from the dashboard) is recreated.
+    """
+    base_dir = os.getcwd()
+    # Independent mkdirs; each thread releases the GIL during its syscall,
+    # which overlaps the round-trips on networked filesystems
+    with ThreadPoolExecutor(max_workers=len(APP_DIRECTORIES)) as executor:
+        list(executor.map(
+            lambda directory: os.makedirs(os.path.join(base_dir, directory), exist_ok=True),
+            APP_DIRECTORIES
+        ))
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion, on a uvloop event loop when it is installed.
+    
+    Unlike installing uvloop's event loop policy, this leaves the global
+    policy untouched for other importers.
+    
+    Args:
+        coro: Coroutine to run
+        
+    Returns:
+        The coroutine's result
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
     
-    for directory in directories:
-        Path(directory).mkdir(exist_ok=True)
+    return uvloop.run(coro)
 
 
 def validate_api_keys() -> Dict[str, bool]:
@@ -66,14 +121,13 @@ def format_duration(seconds: float) -> str:
     Returns:
         Formatted string
     """
+    # %-formatting skips the f-string format-spec machinery on this hot path
     if seconds < 60:
-        return f"{seconds:.2f}s"
+        return "%.2fs" % seconds
     elif seconds < 3600:
-        minutes = seconds / 60
-        return f"{minutes:.2f}m"
+        return "%.2fm" % (seconds / 60)
     else:
-        hours = seconds / 3600
-        return f"{hours:.2f}h"
+        return "%.2fh" % (seconds / 3600)
 
 
 def truncate_text(text: str, max_length: int = 50) -> str:
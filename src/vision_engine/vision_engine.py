@@ -3,19 +3,190 @@ Visual Perception Engine for VLM-based web element detection.
 Uses Playwright for screenshot capture and VLMs for element identification.
 """
 
-import base64
+import asyncio
+import functools
+import hashlib
+import importlib.util
 import io
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
-from pathlib import Path
-from PIL import Image, ImageDraw
+import json
 import os
-from dotenv import load_dotenv
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Any, Union
+from dataclasses import dataclass, asdict
+import numpy as np
+from pathlib import Path
+
+from ..utils import load_config
+
+# Pillow is imported where first used; most callers never annotate images
+if TYPE_CHECKING:
+    from PIL import Image
+
+try:
+    from blake3 import blake3 as _image_hash
+except ImportError:  # optional, SIMD-accelerated hashing
+    _image_hash = hashlib.blake2b
+
+try:
+    from pybase64 import b64encode
+except ImportError:  # optional, SIMD-accelerated base64
+    from base64 import b64encode
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # optional, faster JSON parsing
+    from json import loads as _json_loads
+
+try:
+    import cv2
+except ImportError:  # optional, faster JPEG resize/encode
+    cv2 = None
+
+# Shared provider clients, keyed by provider settings and API key
+_CLIENT_CACHE: Dict[Tuple, Any] = {}
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Keep-alive pool for VLM API calls; batch analysis runs up to 8 requests at once
+_MAX_KEEPALIVE_CONNECTIONS = 32
+_MAX_CONNECTIONS = 64
+
+# A screenshot file path, or the encoded image bytes themselves
+ImageSource = Union[str, bytes]
+
+# OpenAI resizes 'low' detail images to fit 512x512 before the model sees them
+_LOW_DETAIL_DIM = 512
+
+# Upload JPEG quality; VLMs see no difference above this
+_JPEG_QUALITY = 75
+_ANNOTATION_JPEG_QUALITY = 85
+
+# Encoded uploads kept per engine for re-analysis of the same file
+_ENCODE_CACHE_SIZE = 32
+
+# Fixed parts of the analysis prompt; only the goal and context vary per call
+_PROMPT_HEAD = """You are a web navigation assistant analyzing a screenshot of a webpage.
+
+Goal: """
+
+_PROMPT_BODY = """
+
+Task: Identify all interactive elements (buttons, links, inputs, dropdowns, etc.) that could help achieve this goal.
+
+For each element, provide:
+1. Element type (button, link, input, dropdown, etc.)
+2. Brief description (visible text or purpose)
+3. Confidence score (0.0-1.0)
+4. Bounding box coordinates (x, y, width, height) in pixels
+5. Reasoning for why this element is relevant
+6. Recommended action (click, type, scroll, etc.)
+
+"""
+
+_PROMPT_TAIL = """
+Respond in JSON format with an object holding an array of elements:
+{
+  "elements": [
+    {
+      "element_type": "button",
+      "description": "Login button",
+      "confidence": 0.95,
+      "bounding_box": [100, 200, 80, 40],
+      "reasoning": "This button likely leads to authentication",
+      "action": "click"
+    }
+  ]
+}
+
+Focus on elements most relevant to the goal. Identify pop-ups, cookie banners, or obstacles if present.
+"""
 
-load_dotenv()
 
+# Structured-output schema matching _PROMPT_TAIL; strict mode needs every
+# property required and no extras
+_ELEMENTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "elements": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "element_type": {"type": "string"},
+                    "description": {"type": "string"},
+                    "confidence": {"type": "number"},
+                    "bounding_box": {"type": "array", "items": {"type": "integer"}},
+                    "reasoning": {"type": "string"},
+                    "action": {"type": "string"}
+                },
+                "required": ["element_type", "description", "confidence", "bounding_box", "reasoning", "action"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["elements"],
+    "additionalProperties": False
+}
 
-@dataclass
+_OPENAI_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "detected_elements", "schema": _ELEMENTS_SCHEMA, "strict": True}
+}
+
+
+def clear_client_cache():
+    """Forget shared provider clients, e.g. after the API keys change."""
+    _CLIENT_CACHE.clear()
+
+
+@functools.cache
+def _label_font():
+    """Default Pillow font for box labels, loaded once per process."""
+    from PIL import ImageFont
+    return ImageFont.load_default()
+
+
+def _iter_json_arrays(content: str):
+    """
+    Yield each balanced top-level [...] span of content, left to right.
+    
+    A single scan that skips brackets inside JSON strings; unlike a greedy
+    regex it neither backtracks nor glues prose brackets onto the array.
+    """
+    start = content.find("[")
+    while start != -1:
+        depth = 0
+        in_string = False
+        escaped = False
+        end = -1
+        for i in range(start, len(content)):
+            char = content[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "[":
+                depth += 1
+            elif char == "]":
+                depth -= 1
+                if depth == 0:
+                    end = i
+                    break
+        
+        if end == -1:
+            return
+        yield content[start:end + 1]
+        start = content.find("[", end + 1)
+
+
+@dataclass(slots=True, frozen=True)
 class DetectedElement:
     """Represents a detected interactive element on a webpage."""
     element_type: str  # e.g., 'button', 'link', 'input'
@@ -24,6 +195,7 @@ class DetectedElement:
     bounding_box: Tuple[int, int, int, int]  # (x, y, width, height)
     reasoning: str
     action: str  # e.g., 'click', 'type', 'scroll'
+    center: Optional[Tuple[int, int]] = None  # click point, filled in per batch
 
 
 class VisionEngine:
@@ -31,33 +203,129 @@ class VisionEngine:
     Visual Perception Engine that uses VLMs to identify interactive elements.
     """
     
-    def __init__(self, provider: str = "openai", model: str = "gpt-4o"):
+    def __init__(
+        self,
+        provider: str = "openai",
+        model: str = "gpt-4o",
+        cache_dir: Optional[str] = None,
+        max_image_dim: Optional[int] = 1024,
+        max_retries: int = 3,
+        image_detail: str = "high",
+        structured_output: Optional[bool] = None
+    ):
         """
         Initialize the Vision Engine.
         
         Args:
             provider: VLM provider ('openai' or 'google')
             model: Model name to use
+            cache_dir: Optional directory for caching VLM responses
+            max_image_dim: Longest image side sent to the VLM, or None to send
+                screenshots at full resolution
+            max_retries: Retries for transient API errors (OpenAI)
+            image_detail: OpenAI image detail level ('high', 'low' or 'auto');
+                'low' also caps uploads at 512px, all the model looks at
+            structured_output: Send OpenAI's strict json_schema response_format;
+                by default only against api.openai.com, since many self-hosted
+                servers (VLM_API_URL) reject it
         """
         self.provider = provider.lower()
         self.model = model
+        self.max_image_dim = max_image_dim
+        self.max_retries = max_retries
+        self.image_detail = image_detail
+        
+        # Actual token usage reported by the provider, summed over all calls
+        self.token_usage = {"prompt": 0, "completion": 0}
+        
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # (path, mtime_ns, size, max dim) -> (base64 JPEG, scale), least recently used first
+        self._encode_cache: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self._encode_lock = threading.Lock()
+        
         self._setup_client()
+        self._async_client = None
         
+        if structured_output is None:
+            structured_output = not load_config()["vlm_api_url"]
+        self.structured_output = structured_output
+    
     def _setup_client(self):
         """Setup the appropriate VLM client based on provider."""
+        config = load_config()
+        
         if self.provider == "openai":
-            from openai import OpenAI
-            self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            key = ("openai", config["openai_api_key"], config["vlm_api_url"], self.max_retries)
+            if key not in _CLIENT_CACHE:
+                from openai import DefaultHttpxClient, OpenAI
+                _CLIENT_CACHE[key] = OpenAI(
+                    api_key=config["openai_api_key"],
+                    base_url=config["vlm_api_url"],
+                    max_retries=self.max_retries,
+                    http_client=DefaultHttpxClient(**self._http_client_options())
+                )
         elif self.provider == "google":
-            import google.generativeai as genai
-            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-            self.client = genai.GenerativeModel(self.model)
+            key = ("google", config["google_api_key"], self.model)
+            if key not in _CLIENT_CACHE:
+                import google.generativeai as genai
+                genai.configure(api_key=config["google_api_key"])
+                _CLIENT_CACHE[key] = genai.GenerativeModel(
+                    self.model,
+                    generation_config={"response_mime_type": "application/json"}
+                )
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
+        
+        self.client = _CLIENT_CACHE[key]
+    
+    def _get_async_client(self):
+        """Return the AsyncOpenAI client, creating it on first use."""
+        if self._async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            config = load_config()
+            self._async_client = AsyncOpenAI(
+                api_key=config["openai_api_key"],
+                base_url=config["vlm_api_url"],
+                max_retries=self.max_retries,
+                http_client=DefaultAsyncHttpxClient(**self._http_client_options())
+            )
+        return self._async_client
+    
+    async def aclose(self):
+        """
+        Close the AsyncOpenAI client and its connection pool.
+        
+        Call on the loop that used it, before that loop ends; the next async
+        call creates a fresh client.
+        """
+        client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.close()
+    
+    @staticmethod
+    def _http_client_options() -> Dict[str, Any]:
+        """
+        Connection settings for the OpenAI clients' httpx pools.
+        
+        The openai Default*HttpxClient classes keep the SDK's timeouts; this
+        adds HTTP/2, so concurrent requests share one connection, and a
+        larger keep-alive pool for batch analysis.
+        """
+        import httpx
+        return {
+            "http2": _HTTP2_AVAILABLE,
+            "limits": httpx.Limits(
+                max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS,
+                max_connections=_MAX_CONNECTIONS
+            )
+        }
     
     def encode_image(self, image_path: str) -> str:
         """
-        Encode image to base64 string.
+        Encode image to base64 JPEG string, downscaled to max_image_dim.
         
         Args:
             image_path: Path to the image file
@@ -65,8 +333,115 @@ class VisionEngine:
         Returns:
             Base64 encoded image string
         """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        base64_image, _ = self._encode_base64(image_path)
+        return base64_image
+    
+    def _encode_base64(self, screenshot: ImageSource) -> Tuple[str, float]:
+        """
+        Base64 upload JPEG and scale, cached per file version.
+        
+        Retries and re-prompts of the same screenshot file skip the decode,
+        resize and encode; a rewritten file has a new mtime and re-encodes.
+        """
+        if isinstance(screenshot, bytes):
+            image_bytes, scale = self._encode_jpeg(screenshot)
+            return b64encode(image_bytes).decode('ascii'), scale
+        
+        stat = os.stat(screenshot)
+        key = (os.path.abspath(screenshot), stat.st_mtime_ns, stat.st_size, self._max_upload_dim())
+        with self._encode_lock:
+            if key in self._encode_cache:
+                self._encode_cache.move_to_end(key)
+                return self._encode_cache[key]
+        
+        image_bytes, scale = self._encode_jpeg(screenshot)
+        encoded = (b64encode(image_bytes).decode('ascii'), scale)
+        
+        with self._encode_lock:
+            self._encode_cache[key] = encoded
+            if len(self._encode_cache) > _ENCODE_CACHE_SIZE:
+                self._encode_cache.popitem(last=False)
+        return encoded
+    
+    def _load_scaled_image(self, screenshot: ImageSource) -> Tuple["Image.Image", float]:
+        """
+        Load an image and downscale it so its longest side fits max_image_dim.
+        
+        VLMs bill and tile by resolution, so full-size screenshots only add
+        upload bytes and image tokens.
+        
+        Returns:
+            (image, scale) where scale is the resized/original width ratio
+        """
+        from PIL import Image
+        
+        if cv2 is not None:
+            # Same INTER_AREA resize as the upload encoder, so both providers see one image
+            array, scale = self._load_scaled_array(screenshot)
+            return Image.fromarray(cv2.cvtColor(array, cv2.COLOR_BGR2RGB)), scale
+        
+        image = Image.open(io.BytesIO(screenshot) if isinstance(screenshot, bytes) else screenshot)
+        scale = 1.0
+        
+        max_dim = self._max_upload_dim()
+        if max_dim and max(image.size) > max_dim:
+            original_width = image.width
+            # BILINEAR is much cheaper than LANCZOS and the VLM can't tell the difference
+            image.thumbnail((max_dim, max_dim), Image.BILINEAR)
+            scale = image.width / original_width
+        
+        return image, scale
+    
+    def _max_upload_dim(self) -> Optional[int]:
+        """Longest image side to upload, given max_image_dim and image_detail."""
+        if self.image_detail == "low":
+            return min(self.max_image_dim or _LOW_DETAIL_DIM, _LOW_DETAIL_DIM)
+        return self.max_image_dim
+    
+    def _encode_jpeg(self, screenshot: ImageSource) -> Tuple[bytes, float]:
+        """Downscale an image and re-encode it as JPEG bytes."""
+        if cv2 is not None:
+            return self._encode_jpeg_cv2(screenshot)
+        
+        image, scale = self._load_scaled_image(screenshot)
+        
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, "JPEG", quality=_JPEG_QUALITY)
+        return buffer.getvalue(), scale
+    
+    def _encode_jpeg_cv2(self, screenshot: ImageSource) -> Tuple[bytes, float]:
+        """OpenCV version of _encode_jpeg; decodes, resizes and encodes faster than PIL."""
+        image, scale = self._load_scaled_array(screenshot)
+        
+        ok, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), _JPEG_QUALITY])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return buffer.tobytes(), scale
+    
+    def _load_scaled_array(self, screenshot: ImageSource) -> Tuple[np.ndarray, float]:
+        """OpenCV version of _load_scaled_image, returning a BGR array."""
+        if isinstance(screenshot, bytes):
+            image = cv2.imdecode(np.frombuffer(screenshot, np.uint8), cv2.IMREAD_COLOR)
+        else:
+            image = cv2.imread(screenshot, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode screenshot")
+        
+        scale = 1.0
+        height, width = image.shape[:2]
+        max_dim = self._max_upload_dim()
+        if max_dim and max(height, width) > max_dim:
+            scale = max_dim / max(height, width)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            scale = size[0] / width
+        
+        return image, scale
+    
+    def _scale_box(self, bounding_box: List[int], scale: float) -> Tuple[int, int, int, int]:
+        """Map a bounding box from the downscaled image back to screenshot pixels."""
+        # VLMs often return float coordinates; OpenCV drawing needs ints
+        return tuple(int(round(v / scale)) for v in bounding_box)
     
     def analyze_screenshot(
         self,
@@ -85,154 +460,328 @@ class VisionEngine:
         Returns:
             List of detected interactive elements
         """
+        cache_file = self._cache_file(screenshot_path, goal, context)
+        cached = self._load_cached(cache_file)
+        if cached is not None:
+            return cached
+        
         prompt = self._build_analysis_prompt(goal, context)
         
         if self.provider == "openai":
-            return self._analyze_with_openai(screenshot_path, prompt)
+            elements = self._analyze_with_openai(screenshot_path, prompt)
         elif self.provider == "google":
-            return self._analyze_with_google(screenshot_path, prompt)
+            elements = self._analyze_with_google(screenshot_path, prompt)
+        
+        self._store_cached(cache_file, elements)
+        return elements
+    
+    async def analyze_screenshot_async(
+        self,
+        screenshot_path: str,
+        goal: str,
+        context: Optional[str] = None
+    ) -> List[DetectedElement]:
+        """
+        Async variant of analyze_screenshot using the provider's async API.
+        
+        Args:
+            screenshot_path: Path to the screenshot
+            goal: The navigation goal
+            context: Optional context about the current page state
+            
+        Returns:
+            List of detected interactive elements
+        """
+        return await self._analyze_async(screenshot_path, goal, context)
+    
+    async def analyze_screenshot_bytes(
+        self,
+        image_bytes: bytes,
+        goal: str,
+        context: Optional[str] = None
+    ) -> List[DetectedElement]:
+        """
+        Async analysis of an in-memory screenshot, e.g. from page.screenshot().
+        
+        Args:
+            image_bytes: Encoded screenshot (JPEG or PNG)
+            goal: The navigation goal
+            context: Optional context about the current page state
+            
+        Returns:
+            List of detected interactive elements
+        """
+        return await self._analyze_async(image_bytes, goal, context)
+    
+    async def analyze_screenshots_batch_async(
+        self,
+        screenshot_paths: List[str],
+        goals: List[str],
+        contexts: Optional[List[Optional[str]]] = None,
+        max_concurrency: int = 8
+    ) -> List[List[DetectedElement]]:
+        """
+        Analyze many screenshots concurrently.
+        
+        Args:
+            screenshot_paths: Paths to the screenshots
+            goals: Navigation goal for each screenshot
+            contexts: Optional page context for each screenshot
+            max_concurrency: Maximum VLM requests in flight
+            
+        Returns:
+            Detected elements per screenshot, in input order; a failed request
+            yields an empty list
+        """
+        contexts = contexts or [None] * len(screenshot_paths)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _analyze_one(path: str, goal: str, context: Optional[str]) -> List[DetectedElement]:
+            async with semaphore:
+                return await self._analyze_async(path, goal, context)
+        
+        results = await asyncio.gather(
+            *[_analyze_one(*request) for request in zip(screenshot_paths, goals, contexts)],
+            return_exceptions=True
+        )
+        
+        elements = []
+        for path, result in zip(screenshot_paths, results):
+            if isinstance(result, BaseException):
+                print(f"Error analyzing {path}: {result}")
+                result = []
+            elements.append(result)
+        return elements
+    
+    def analyze_screenshots_batch(
+        self,
+        screenshot_paths: List[str],
+        goals: List[str],
+        contexts: Optional[List[Optional[str]]] = None,
+        max_concurrency: int = 8
+    ) -> List[List[DetectedElement]]:
+        """Blocking wrapper around analyze_screenshots_batch_async."""
+        async def _run():
+            # The async client is bound to the loop it was created on
+            self._async_client = None
+            try:
+                return await self.analyze_screenshots_batch_async(
+                    screenshot_paths, goals, contexts, max_concurrency
+                )
+            finally:
+                await self.aclose()
+        
+        return asyncio.run(_run())
+    
+    async def _analyze_async(
+        self,
+        screenshot: ImageSource,
+        goal: str,
+        context: Optional[str]
+    ) -> List[DetectedElement]:
+        """Shared body of the async analysis entry points."""
+        cache_file = self._cache_file(screenshot, goal, context)
+        cached = self._load_cached(cache_file)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_analysis_prompt(goal, context)
+        
+        if self.provider == "openai":
+            elements = await self._analyze_with_openai_async(screenshot, prompt)
+        elif self.provider == "google":
+            elements = await self._analyze_with_google_async(screenshot, prompt)
+        
+        self._store_cached(cache_file, elements)
+        return elements
+    
+    def _cache_file(self, screenshot: ImageSource, goal: str, context: Optional[str]) -> Optional[Path]:
+        """Return the cache file for a request, or None when caching is off."""
+        if not self.cache_dir:
+            return None
+        return self.cache_dir / f"{self._cache_key(screenshot, goal, context)}.json"
+    
+    def _store_cached(self, cache_file: Optional[Path], elements: List[DetectedElement]):
+        """Cache elements; failed calls return an empty list and are not worth caching."""
+        if cache_file is not None and elements:
+            with open(cache_file, 'w') as f:
+                json.dump([asdict(e) for e in elements], f)
+    
+    def _cache_key(self, screenshot: ImageSource, goal: str, context: Optional[str]) -> str:
+        """Build a response cache key from the screenshot bytes and request."""
+        if isinstance(screenshot, bytes):
+            image_digest = _image_hash(screenshot).hexdigest()
+        else:
+            # Hash in chunks rather than reading the whole file into one bytes object
+            with open(screenshot, "rb") as image_file:
+                image_digest = hashlib.file_digest(image_file, _image_hash).hexdigest()
+        
+        key = f"{image_digest}|{goal}|{context or ''}|{self.provider}|{self.model}"
+        return hashlib.blake2b(key.encode('utf-8')).hexdigest()
+    
+    def _load_cached(self, cache_file: Optional[Path]) -> Optional[List[DetectedElement]]:
+        """Load cached elements, or None on a cache miss."""
+        if cache_file is None or not cache_file.exists():
+            return None
+        
+        try:
+            with open(cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        
+        return [
+            DetectedElement(**{**elem, "bounding_box": tuple(elem["bounding_box"])})
+            for elem in data
+        ]
     
     def _build_analysis_prompt(self, goal: str, context: Optional[str] = None) -> str:
         """Build the prompt for VLM analysis."""
-        base_prompt = f"""You are a web navigation assistant analyzing a screenshot of a webpage.
-
-Goal: {goal}
-
-Task: Identify all interactive elements (buttons, links, inputs, dropdowns, etc.) that could help achieve this goal.
-
-For each element, provide:
-1. Element type (button, link, input, dropdown, etc.)
-2. Brief description (visible text or purpose)
-3. Confidence score (0.0-1.0)
-4. Bounding box coordinates (x, y, width, height) in pixels
-5. Reasoning for why this element is relevant
-6. Recommended action (click, type, scroll, etc.)
-
-"""
-        
         if context:
-            base_prompt += f"\nCurrent context: {context}\n"
-        
-        base_prompt += """
-Respond in JSON format with an array of elements:
-[
-  {
-    "element_type": "button",
-    "description": "Login button",
-    "confidence": 0.95,
-    "bounding_box": [100, 200, 80, 40],
-    "reasoning": "This button likely leads to authentication",
-    "action": "click"
-  }
-]
-
-Focus on elements most relevant to the goal. Identify pop-ups, cookie banners, or obstacles if present.
-"""
-        return base_prompt
+            return "".join((_PROMPT_HEAD, goal, _PROMPT_BODY, "\nCurrent context: ", context, "\n", _PROMPT_TAIL))
+        return "".join((_PROMPT_HEAD, goal, _PROMPT_BODY, _PROMPT_TAIL))
     
     def _analyze_with_openai(
         self,
-        screenshot_path: str,
+        screenshot: ImageSource,
         prompt: str
     ) -> List[DetectedElement]:
         """Analyze screenshot using OpenAI's vision model."""
-        import json
+        # Encode once; the SDK retries transient failures with this same payload
+        request, scale = self._build_openai_request(screenshot, prompt)
         
-        base64_image = self.encode_image(screenshot_path)
+        try:
+            response = self.client.chat.completions.create(**request)
+            return self._parse_openai_response(response, scale)
+        
+        except Exception as e:
+            print(f"Error analyzing with OpenAI: {e}")
+            return []
+    
+    async def _analyze_with_openai_async(
+        self,
+        screenshot: ImageSource,
+        prompt: str
+    ) -> List[DetectedElement]:
+        """Analyze screenshot using OpenAI's vision model via AsyncOpenAI."""
+        # Image decode/encode is CPU work; keep it off the event loop
+        request, scale = await asyncio.to_thread(
+            self._build_openai_request, screenshot, prompt
+        )
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=2000,
-                temperature=0.2
-            )
-            
-            content = response.choices[0].message.content
-            
-            # Extract JSON from response
-            elements_data = self._extract_json(content)
-            
-            return [
-                DetectedElement(
-                    element_type=elem.get("element_type", "unknown"),
-                    description=elem.get("description", ""),
-                    confidence=elem.get("confidence", 0.5),
-                    bounding_box=tuple(elem.get("bounding_box", [0, 0, 0, 0])),
-                    reasoning=elem.get("reasoning", ""),
-                    action=elem.get("action", "click")
-                )
-                for elem in elements_data
-            ]
-            
+            response = await self._get_async_client().chat.completions.create(**request)
+            return self._parse_openai_response(response, scale)
+        
         except Exception as e:
             print(f"Error analyzing with OpenAI: {e}")
             return []
     
+    def _build_openai_request(self, screenshot: ImageSource, prompt: str) -> Tuple[Dict, float]:
+        """Build chat.completions.create kwargs and the image scale."""
+        base64_image, scale = self._encode_base64(screenshot)
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "detail": self.image_detail
+                        }
+                    }
+                ]
+            }
+        ]
+        
+        request = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": 2000,
+            "temperature": 0.2
+        }
+        if self.structured_output:
+            request["response_format"] = _OPENAI_RESPONSE_FORMAT
+        return request, scale
+    
+    def _parse_openai_response(self, response, scale: float) -> List[DetectedElement]:
+        """Record token usage and build elements from an OpenAI response."""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.token_usage["prompt"] += usage.prompt_tokens or 0
+            self.token_usage["completion"] += usage.completion_tokens or 0
+        
+        content = response.choices[0].message.content
+        
+        # Extract JSON from response
+        return self._build_elements(self._extract_json(content), scale)
+    
     def _analyze_with_google(
         self,
-        screenshot_path: str,
+        screenshot: ImageSource,
         prompt: str
     ) -> List[DetectedElement]:
         """Analyze screenshot using Google's Gemini vision model."""
-        import json
-        from PIL import Image
-        
         try:
-            image = Image.open(screenshot_path)
+            image, scale = self._load_scaled_image(screenshot)
             
             response = self.client.generate_content([prompt, image])
-            content = response.text
+            return self._parse_google_response(response, scale)
             
-            # Extract JSON from response
-            elements_data = self._extract_json(content)
+        except Exception as e:
+            print(f"Error analyzing with Google: {e}")
+            return []
+    
+    async def _analyze_with_google_async(
+        self,
+        screenshot: ImageSource,
+        prompt: str
+    ) -> List[DetectedElement]:
+        """Analyze screenshot using Google's Gemini vision model asynchronously."""
+        try:
+            image, scale = await asyncio.to_thread(self._load_scaled_image, screenshot)
             
-            return [
-                DetectedElement(
-                    element_type=elem.get("element_type", "unknown"),
-                    description=elem.get("description", ""),
-                    confidence=elem.get("confidence", 0.5),
-                    bounding_box=tuple(elem.get("bounding_box", [0, 0, 0, 0])),
-                    reasoning=elem.get("reasoning", ""),
-                    action=elem.get("action", "click")
-                )
-                for elem in elements_data
-            ]
+            response = await self.client.generate_content_async([prompt, image])
+            return self._parse_google_response(response, scale)
             
         except Exception as e:
             print(f"Error analyzing with Google: {e}")
             return []
     
-    def _extract_json(self, content: str) -> List[Dict]:
-        """Extract JSON array from response content."""
-        import json
-        import re
+    def _parse_google_response(self, response, scale: float) -> List[DetectedElement]:
+        """Record token usage and build elements from a Gemini response."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.token_usage["prompt"] += usage.prompt_token_count or 0
+            self.token_usage["completion"] += usage.candidates_token_count or 0
         
-        # Try to find JSON array in the response
-        json_match = re.search(r'\[[\s\S]*\]', content)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
-                pass
+        content = response.text
         
-        # Try to parse the entire content as JSON
+        # Extract JSON from response
+        return self._build_elements(self._extract_json(content), scale)
+    
+    def _build_elements(self, elements_data: List[Dict], scale: float) -> List[DetectedElement]:
+        """Build DetectedElement rows, mapping boxes back to screenshot pixels."""
+        return [
+            DetectedElement(
+                element_type=elem.get("element_type", "unknown"),
+                description=elem.get("description", ""),
+                confidence=elem.get("confidence", 0.5),
+                bounding_box=self._scale_box(elem.get("bounding_box", [0, 0, 0, 0]), scale),
+                reasoning=elem.get("reasoning", ""),
+                action=elem.get("action", "click")
+            )
+            for elem in elements_data
+        ]
+    
+    def _extract_json(self, content: str) -> List[Dict]:
+        """Extract JSON array from response content."""
+        # orjson's JSONDecodeError subclasses json's, so one except covers both
+        # Structured output makes the whole content the JSON document
         try:
-            result = json.loads(content)
+            result = _json_loads(content)
             if isinstance(result, list):
                 return result
             elif isinstance(result, dict) and 'elements' in result:
@@ -240,6 +789,16 @@ Focus on elements most relevant to the goal. Identify pop-ups, cookie banners, o
         except json.JSONDecodeError:
             pass
         
+        # Endpoints without structured output may wrap the array in prose
+        for json_text in _iter_json_arrays(content):
+            try:
+                result = _json_loads(json_text)
+            except json.JSONDecodeError:
+                continue
+            # Skip prose like "[1]"; elements are objects
+            if isinstance(result, list) and all(isinstance(item, dict) for item in result):
+                return result
+        
         return []
     
     def draw_bounding_boxes(
@@ -259,10 +818,83 @@ Focus on elements most relevant to the goal. Identify pop-ups, cookie banners, o
         Returns:
             Path to the annotated image
         """
-        image = Image.open(screenshot_path)
+        if cv2 is not None:
+            image = self._draw_cv2(self._read_bgr(screenshot_path), elements)
+            if not cv2.imwrite(output_path, image):
+                raise ValueError(f"Could not write annotated image: {output_path}")
+            return output_path
+        
+        from PIL import Image
+        
+        image = self._draw_pil(Image.open(screenshot_path), elements)
+        image.save(output_path)
+        return output_path
+    
+    def annotate_bytes(
+        self,
+        screenshot_path: str,
+        elements: List[DetectedElement]
+    ) -> bytes:
+        """
+        Draw bounding boxes and return the result as JPEG bytes.
+        
+        Use this instead of draw_bounding_boxes when the annotated image is
+        passed straight on (uploaded, displayed) rather than kept on disk.
+        
+        Args:
+            screenshot_path: Path to original screenshot
+            elements: List of detected elements
+            
+        Returns:
+            JPEG-encoded annotated image
+        """
+        if cv2 is not None:
+            image = self._draw_cv2(self._read_bgr(screenshot_path), elements)
+            ok, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), _ANNOTATION_JPEG_QUALITY])
+            if not ok:
+                raise ValueError(f"Could not encode annotated image: {screenshot_path}")
+            return buffer.tobytes()
+        
+        from PIL import Image
+        
+        image = self._draw_pil(Image.open(screenshot_path).convert("RGB"), elements)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=_ANNOTATION_JPEG_QUALITY)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def _read_bgr(screenshot_path: str) -> np.ndarray:
+        """Read a screenshot as an OpenCV BGR array."""
+        image = cv2.imread(screenshot_path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Could not read screenshot: {screenshot_path}")
+        return image
+    
+    @staticmethod
+    def _draw_cv2(image: np.ndarray, elements: List[DetectedElement]) -> np.ndarray:
+        """Draw boxes and labels onto a BGR array in place; each primitive is one C call."""
+        # BGR
+        red, yellow = (0, 0, 255), (0, 255, 255)
+        for elem in elements:
+            # cv2 rejects float coordinates
+            x, y, w, h = (int(round(v)) for v in elem.bounding_box)
+            
+            cv2.rectangle(image, (x, y), (x + w, y + h), red if elem.confidence > 0.7 else yellow, 3)
+            
+            label = f"{elem.element_type}: {elem.description[:20]}"
+            cv2.putText(image, label, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, red, 1, cv2.LINE_AA)
+        
+        return image
+    
+    @staticmethod
+    def _draw_pil(image: "Image.Image", elements: List[DetectedElement]) -> "Image.Image":
+        """Pillow fallback for _draw_cv2."""
+        from PIL import ImageDraw
+        
         draw = ImageDraw.Draw(image)
+        font = _label_font()
         
-        for i, elem in enumerate(elements):
+        for elem in elements:
             x, y, w, h = elem.bounding_box
             
             # Draw rectangle
@@ -274,10 +906,9 @@ Focus on elements most relevant to the goal. Identify pop-ups, cookie banners, o
             
             # Draw label
             label = f"{elem.element_type}: {elem.description[:20]}"
-            draw.text((x, y - 20), label, fill="red")
+            draw.text((x, y - 20), label, fill="red", font=font)
         
-        image.save(output_path)
-        return output_path
+        return image
     
     def calculate_click_coordinates(
         self,
@@ -294,3 +925,19 @@ Focus on elements most relevant to the goal. Identify pop-ups, cookie banners, o
         """
         x, y, w, h = bounding_box
         return (x + w // 2, y + h // 2)
+    
+    def calculate_click_coordinates_batch(
+        self,
+        bounding_boxes: List[Tuple[int, int, int, int]]
+    ) -> np.ndarray:
+        """
+        Vectorized calculate_click_coordinates for many elements at once.
+        
+        Args:
+            bounding_boxes: (x, y, width, height) per element
+            
+        Returns:
+            (N, 2) int array of click coordinates
+        """
+        boxes = np.asarray(bounding_boxes, dtype=np.int32).reshape(-1, 4)
+        return boxes[:, :2] + boxes[:, 2:] // 2
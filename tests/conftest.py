@@ -1,8 +1,18 @@
 """Test configuration and fixtures."""
 
 import pytest
-import os
 from pathlib import Path
+from src.utils.helpers import _read_config
+from src.vision_engine.vision_engine import clear_client_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    """Drop cached config and provider clients so each test sees its own environment."""
+    _read_config.cache_clear()
+    clear_client_cache()
+    yield
+    clear_client_cache()
 
 
 @pytest.fixture(scope="session")
@@ -20,20 +30,12 @@ def sample_screenshot(test_data_dir):
 
 
 @pytest.fixture
-def mock_env():
+def mock_env(monkeypatch):
     """Mock environment variables."""
-    original_env = os.environ.copy()
-    
-    # Set test environment variables
-    os.environ['OPENAI_API_KEY'] = 'test-openai-key'
-    os.environ['GOOGLE_API_KEY'] = 'test-google-key'
-    os.environ['VLM_PROVIDER'] = 'openai'
-    
-    yield
-    
-    # Restore original environment
-    os.environ.clear()
-    os.environ.update(original_env)
+    # monkeypatch restores only the keys it set
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-openai-key')
+    monkeypatch.setenv('GOOGLE_API_KEY', 'test-google-key')
+    monkeypatch.setenv('VLM_PROVIDER', 'openai')
 
 
 @pytest.fixture
@@ -0,0 +1,130 @@
+"""
+Unit tests for the benchmark runner
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from src.benchmarking import benchmark_runner as runner_module
+from src.benchmarking.benchmark_runner import BenchmarkRunner
+
+
+class FakeNavigationAgent:
+    """Stands in for NavigationAgent, tracking how many navigations overlap."""
+    
+    in_flight = 0
+    peak = 0
+    
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+    
+    async def navigate(self, url, goal):
+        cls = FakeNavigationAgent
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+        await asyncio.sleep(0.01)
+        cls.in_flight -= 1
+        return {
+            "completed": True,
+            "error": None,
+            "step_count": 2,
+            "action_history": [{"action_type": "click"}],
+            "token_usage": {"prompt": 800, "completion": 200}
+        }
+
+
+def fake_dom_worker(url, goal, selectors):
+    """DOM worker that succeeds for every URL except /broken."""
+    success = not url.endswith("/broken")
+    return {
+        "goal": goal,
+        "url": url,
+        "success": success,
+        "duration": 0.5,
+        "data_extracted": [{"url": url, "timestamp": "", "fields": {"titles": ["A"]}}] if success else []
+    }
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """Runner in a temporary directory with the agent and DOM worker mocked."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(runner_module, "NavigationAgent", FakeNavigationAgent)
+    monkeypatch.setattr(runner_module, "_dom_worker", fake_dom_worker)
+    FakeNavigationAgent.in_flight = FakeNavigationAgent.peak = 0
+    
+    runner = BenchmarkRunner()
+    pool = ThreadPoolExecutor(max_workers=4)
+    runner._get_proc_pool = lambda: pool
+    yield runner
+    pool.shutdown()
+    runner.metrics_tracker.close()
+
+
+class TestBenchmarkRunner:
+    """Test cases for BenchmarkRunner."""
+    
+    def test_duel_batch_bounds_concurrency_and_logs_ndjson(self, runner):
+        """Test that at most `concurrency` duels run at once, each logged as one line."""
+        tasks = [(f"https://example.com/{i}", f"goal {i}", {"titles": "h3"}) for i in range(5)]
+        
+        results = asyncio.run(runner.run_duel_batch(tasks, concurrency=2))
+        
+        assert [r["goal"] for r in results] == [f"goal {i}" for i in range(5)]
+        assert FakeNavigationAgent.peak == 2
+        
+        lines = runner.duels_log.read_bytes().splitlines()
+        assert sorted(json.loads(line)["goal"] for line in lines) == [f"goal {i}" for i in range(5)]
+        assert not list(runner.results_dir.glob("duel_*.json"))
+    
+    def test_run_duel_writes_comparison(self, runner):
+        """Test a single duel's comparison, cost and duel file."""
+        comparison = asyncio.run(runner.run_duel("https://example.com/broken", "Find titles"))
+        
+        summary = comparison["comparison"]
+        assert summary["vlm_success"] is True
+        assert summary["dom_success"] is False
+        assert summary["winner"] == "VLM (only successful)"
+        assert summary["vlm_cost"] == pytest.approx(0.01)
+        assert len(list(runner.results_dir.glob("duel_*.json"))) == 1
+    
+    def test_dom_duration_comes_from_worker(self, runner):
+        """Test that the blocking wrapper reports the worker's own timing."""
+        results = runner.run_dom_crawler("https://example.com/", "Find titles", {"titles": "h3"})
+        
+        assert results["success"] is True
+        assert results["crawler_type"] == "dom"
+        assert results["duration"] == 0.5
+    
+    @pytest.mark.parametrize("vlm, dom, winner", [
+        ({"success": True}, {"success": False}, "VLM (only successful)"),
+        ({"success": False}, {"success": True}, "DOM (only successful)"),
+        ({"success": False}, {"success": False}, "Tie (both failed)"),
+        ({"success": True, "duration": 1.0}, {"success": True, "duration": 2.0}, "VLM (faster)"),
+        ({"success": True, "duration": 3.0}, {"success": True, "duration": 2.0}, "DOM (faster)"),
+    ])
+    def test_determine_winner(self, runner, vlm, dom, winner):
+        """Test the outcome table and the duration tie-break."""
+        assert runner._determine_winner(vlm, dom) == winner
+    
+    def test_aexit_releases_resources(self, runner):
+        """Test that leaving the context waits for the pool and closes the browser."""
+        pool = MagicMock()
+        browser = MagicMock(close=AsyncMock())
+        playwright = MagicMock(stop=AsyncMock())
+        runner._proc_pool, runner._browser, runner._playwright = pool, browser, playwright
+        runner.metrics_tracker.record_crawl("dom", "goal", "url", True, 1, [], 1.0)
+        
+        asyncio.run(runner.__aexit__(None, None, None))
+        
+        pool.shutdown.assert_called_once_with(wait=True)
+        browser.close.assert_awaited_once()
+        playwright.stop.assert_awaited_once()
+        assert runner._proc_pool is runner._browser is runner._playwright is None
+        assert runner.metrics_tracker.crawl_log.read_bytes().count(b"\n") == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
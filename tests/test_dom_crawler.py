@@ -0,0 +1,149 @@
+"""
+Unit tests for the DOM crawler
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import httpx
+import pytest
+from src.crawler import DOMCrawler, SimpleSeleniumCrawler
+from src.crawler.dom_crawler import _plan_selectors
+
+
+PAGES = {
+    "/": '<a href="/a">A</a><a href="/b">B</a><a href="mailto:x@example.com">Mail</a><h2>Home</h2>',
+    "/a": '<a href="/">Home</a><a href="/c">C</a><h2>Page A</h2>',
+    "/b": '<h2>Page B</h2>',
+    "/c": '<p>No heading</p>',
+}
+
+
+def make_client(requested=None):
+    """Build a client that serves PAGES for any host and records request times."""
+    def handler(request):
+        if requested is not None:
+            requested.append((request.url.host, request.url.path, time.monotonic()))
+        html = PAGES.get(request.url.path)
+        if html is None:
+            return httpx.Response(404)
+        return httpx.Response(200, text=html, headers={"content-type": "text/html"})
+    
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def crawler_dir(tmp_path, monkeypatch):
+    """Run crawlers in a temporary working directory (results go to ./data)."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class TestDOMCrawler:
+    """Test cases for DOMCrawler."""
+    
+    def test_crawl_site_follows_links_and_extracts(self, crawler_dir):
+        """Test breadth-first link following, extraction and the saved results."""
+        crawler = DOMCrawler(max_pages=3, request_delay=0.0)
+        
+        async def crawl():
+            async with make_client() as client:
+                return await crawler._crawl_site(
+                    client, "https://example.com/", "headings", _plan_selectors({"headings": "h2"})
+                )
+        
+        results = asyncio.run(crawl())
+        
+        assert results["pages_crawled"] == 3
+        assert [step["url"] for step in results["action_history"]] == [
+            "https://example.com/", "https://example.com/a", "https://example.com/b"
+        ]
+        assert [page["fields"]["headings"] for page in results["data_extracted"]] == [
+            ["Home"], ["Page A"], ["Page B"]
+        ]
+        assert results["success"] is True
+        assert len(list((crawler_dir / "data").glob("dom_crawl_*.json"))) == 1
+    
+    def test_crawl_many_keeps_input_order(self, crawler_dir):
+        """Test that concurrent site crawls come back in input order."""
+        crawler = DOMCrawler(max_pages=1, request_delay=0.0)
+        crawler._new_client = make_client
+        urls = ["https://one.example/b", "https://two.example/missing", "https://three.example/"]
+        
+        results = asyncio.run(crawler.crawl_many(urls, "headings", {"headings": "h2"}, concurrency=2))
+        
+        assert [r["start_url"] for r in results] == urls
+        assert [r["success"] for r in results] == [True, False, True]
+    
+    def test_crawl_many_plans_selectors_once(self, crawler_dir, monkeypatch):
+        """Test that the selector plan is shared by every site in a batch."""
+        calls = []
+        monkeypatch.setattr(
+            "src.crawler.dom_crawler._plan_selectors",
+            lambda selectors: calls.append(selectors) or _plan_selectors(selectors)
+        )
+        crawler = DOMCrawler(max_pages=1, request_delay=0.0)
+        crawler._new_client = make_client
+        
+        asyncio.run(crawler.crawl_many(
+            ["https://one.example/", "https://two.example/"], "headings", {"headings": "h2"}
+        ))
+        
+        assert calls == [{"headings": "h2"}]
+    
+    def test_default_request_delay_is_polite(self, crawler_dir):
+        """Test that crawls are throttled unless the caller opts out."""
+        assert DOMCrawler().request_delay == 1.0
+    
+    def test_request_delay_spaces_requests_per_host(self, crawler_dir):
+        """Test that request_delay applies per host, not across hosts."""
+        requested = []
+        crawler = DOMCrawler(max_pages=3, request_delay=0.1)
+        crawler._new_client = lambda: make_client(requested)
+        
+        asyncio.run(crawler.crawl_many(
+            ["https://one.example/", "https://two.example/"], "headings", {"headings": "h2"}
+        ))
+        
+        for host in ("one.example", "two.example"):
+            times = [t for h, _, t in requested if h == host]
+            assert len(times) == 3
+            assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+        
+        first_one = next(t for h, _, t in requested if h == "one.example")
+        first_two = next(t for h, _, t in requested if h == "two.example")
+        assert abs(first_one - first_two) < 0.05
+
+    
+    def test_selenium_crawler_uses_the_same_page_record(self, crawler_dir):
+        """Test that SimpleSeleniumCrawler returns DOMCrawler's {url, timestamp, fields} records."""
+        selenium_stubs = {
+            "selenium": MagicMock(),
+            "selenium.common": MagicMock(),
+            "selenium.common.exceptions": SimpleNamespace(InvalidSelectorException=ValueError),
+            "selenium.webdriver": MagicMock(),
+            "selenium.webdriver.common": MagicMock(),
+            "selenium.webdriver.common.by": SimpleNamespace(By=SimpleNamespace(CSS_SELECTOR="css selector")),
+        }
+        driver = MagicMock()
+        driver.execute_script.return_value = {"headings": ["Home"], "missing": []}
+        driver.page_source = "<ul><li>one</li><li>two</li></ul>"
+        
+        crawler = SimpleSeleniumCrawler()
+        crawler._driver = driver
+        with patch.dict("sys.modules", selenium_stubs):
+            results = crawler.crawl(
+                "https://example.com/", "headings", {"headings": "h2", "missing": "h6", "items": "//li/text()"}
+            )
+        
+        driver.find_elements.assert_called_once_with("css selector", "h2")
+        [page] = results["data_extracted"]
+        assert page["url"] == "https://example.com/"
+        assert page["fields"] == {"headings": ["Home"], "items": ["one", "two"]}
+        assert set(page) == {"url", "timestamp", "fields"}
+        assert results["success"] is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
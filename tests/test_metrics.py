@@ -5,6 +5,9 @@ Unit tests for benchmarking metrics
 import pytest
 from src.benchmarking import MetricsTracker, CrawlMetrics, ResilienceMetrics
 from pathlib import Path
+import json
+import subprocess
+import sys
 import tempfile
 import shutil
 
@@ -58,6 +61,58 @@ class TestMetricsTracker:
         success_rate = tracker.calculate_success_rate("vlm")
         assert success_rate == 2/3
     
+    def test_compare_crawlers(self, tracker, temp_dir):
+        """Test crawler comparison, including after reloading history."""
+        tracker.record_crawl("vlm", "goal1", "url", True, 1, [], 2.0, total_tokens=1000)
+        tracker.record_crawl("vlm", "goal2", "url", False, 1, [], 4.0, total_tokens=3000)
+        tracker.record_crawl("dom", "goal3", "url", True, 1, [], 1.0)
+        tracker.record_resilience_test("vlm", "scenario", 2, True, True)
+        
+        comparison = tracker.compare_crawlers()
+        
+        assert comparison["vlm"]["count"] == 2
+        assert comparison["vlm"]["avg_duration"] == 3.0
+        assert comparison["vlm"]["avg_resilience"] == 1.0
+        assert comparison["vlm"]["cost_metrics"]["avg_tokens_per_crawl"] == 2000
+        assert comparison["vlm"]["cost_metrics"]["cost_per_success"] == pytest.approx(0.04)
+        assert comparison["dom"]["success_rate"] == 1.0
+        assert tracker.calculate_success_rate() == 2/3
+        
+        tracker.close()
+        assert MetricsTracker(output_dir=temp_dir).compare_crawlers() == comparison
+    
+    def test_export_to_csv(self, tracker, temp_dir):
+        """Test exporting crawl metrics to CSV."""
+        tracker.record_crawl("vlm", "goal1", "url", True, 2, [], 1.5)
+        tracker.record_crawl("dom", "goal2", "url", False, 1, [], 0.5)
+        
+        filename = tracker.export_to_csv(str(Path(temp_dir) / "export.csv"))
+        
+        lines = Path(filename).read_text().splitlines()
+        assert lines[0].split(",")[:3] == ["crawler_type", "goal", "start_url"]
+        assert len(lines) == 3
+        assert lines[1].startswith("vlm,goal1,url,True,2")
+        
+        dom_file = tracker.export_to_csv(str(Path(temp_dir) / "dom.csv"), crawler_type="dom")
+        dom_lines = Path(dom_file).read_text().splitlines()
+        assert len(dom_lines) == 2
+        assert dom_lines[1].startswith("dom,goal2")
+    
+    def test_get_crawls_by_type(self, tracker, temp_dir):
+        """Test the per-type crawl index, including after reloading history."""
+        tracker.record_crawl("vlm", "goal1", "url", True, 1, [], 1.0)
+        tracker.record_crawl("dom", "goal2", "url", True, 1, [], 1.0)
+        tracker.record_crawl("vlm", "goal3", "url", True, 1, [], 1.0)
+        
+        assert [m.goal for m in tracker.get_crawls("vlm")] == ["goal1", "goal3"]
+        assert len(tracker.get_crawls()) == 3
+        assert tracker.get_crawls("other") == []
+        
+        tracker.close()
+        reloaded = MetricsTracker(output_dir=temp_dir)
+        assert [m.goal for m in reloaded.get_crawls("dom")] == ["goal2"]
+        reloaded.close()
+    
     def test_record_resilience_test(self, tracker):
         """Test recording resilience test."""
         metrics = tracker.record_resilience_test(
@@ -70,6 +125,65 @@ class TestMetricsTracker:
         
         assert metrics.resilience_score == 1.0
         assert metrics.dom_changes_applied == 5
+    
+    def test_history_persists(self, tracker, temp_dir):
+        """Test that recorded metrics are reloaded by a new tracker."""
+        tracker.record_crawl("vlm", "goal1", "url", True, 1, [], 1.0)
+        tracker.record_crawl("dom", "goal2", "url", False, 1, [], 2.0)
+        tracker.record_resilience_test("dom", "scenario", 3, True, False)
+        tracker.close()
+        
+        reloaded = MetricsTracker(output_dir=temp_dir)
+        
+        assert [m.goal for m in reloaded.metrics_history] == ["goal1", "goal2"]
+        assert reloaded.resilience_history[0].resilience_score == 0.0
+    
+    def test_records_are_buffered_until_threshold(self, temp_dir):
+        """Test that records are written in batches of flush_threshold."""
+        tracker = MetricsTracker(output_dir=temp_dir, flush_threshold=2)
+        crawl_log = Path(temp_dir) / "crawl.jsonl"
+        
+        tracker.record_crawl("vlm", "goal1", "url", True, 1, [], 1.0)
+        assert crawl_log.read_bytes() == b""
+        
+        tracker.record_crawl("vlm", "goal2", "url", True, 1, [], 1.0)
+        assert len(crawl_log.read_bytes().splitlines()) == 2
+        tracker.close()
+    
+    def test_dropped_tracker_flushes_its_records(self, temp_dir):
+        """Test that an unreferenced tracker is collected and writes its buffer."""
+        tracker = MetricsTracker(output_dir=temp_dir)
+        tracker.record_crawl("vlm", "goal1", "url", True, 1, [], 1.0)
+        crawl_fp = tracker._crawl_fp
+        
+        del tracker
+        
+        assert crawl_fp.closed
+        assert len((Path(temp_dir) / "crawl.jsonl").read_bytes().splitlines()) == 1
+    
+    @pytest.mark.parametrize("streaming", [True, False])
+    def test_legacy_metrics_file_is_migrated(self, temp_dir, monkeypatch, streaming):
+        """Test loading history from the old single metrics.json file."""
+        if not streaming:
+            monkeypatch.setattr("src.benchmarking.metrics.ijson", None)
+        
+        legacy = {
+            "crawl_metrics": [{
+                "crawler_type": "vlm", "goal": "old", "start_url": "url",
+                "success": True, "pages_visited": 1, "data_points_extracted": 0,
+                "duration_seconds": 1.0, "api_calls": 1, "total_tokens": 100,
+                "cost_usd": 0.001, "errors": [], "action_count": 1,
+                "timestamp": "2024-01-01T00:00:00"
+            }],
+            "resilience_metrics": []
+        }
+        (Path(temp_dir) / "metrics.json").write_text(json.dumps(legacy))
+        
+        tracker = MetricsTracker(output_dir=temp_dir)
+        tracker.close()
+        
+        assert tracker.metrics_history[0].goal == "old"
+        assert (Path(temp_dir) / "crawl.jsonl").exists()
 
 
 class TestCrawlMetrics:
@@ -96,6 +210,52 @@ class TestCrawlMetrics:
         assert metrics.crawler_type == "dom"
         assert metrics.success is True
         assert metrics.cost_usd == 0.0
+    
+    def test_to_dict_matches_asdict(self):
+        """Test that the attrgetter serializer matches dataclasses.asdict."""
+        from dataclasses import asdict
+        from src.benchmarking.metrics import _to_dict
+        
+        metrics = CrawlMetrics(
+            crawler_type="vlm",
+            goal="Find price",
+            start_url="https://example.com",
+            success=False,
+            pages_visited=1,
+            data_points_extracted=0,
+            duration_seconds=1.5,
+            api_calls=2,
+            total_tokens=300,
+            cost_usd=0.003,
+            errors=["timeout"],
+            action_count=1,
+            timestamp="2024-01-01T00:00:00"
+        )
+        
+        assert _to_dict(metrics) == asdict(metrics)
+        assert not hasattr(metrics, "__dict__")
+
+
+class TestLazyImports:
+    """Test that importing metrics does not pull in the crawler stack."""
+    
+    def test_benchmarking_import_is_lazy(self):
+        """Test that BenchmarkRunner and its dependencies load on demand."""
+        code = (
+            "import sys\n"
+            "import src\n"
+            "from src.benchmarking import MetricsTracker\n"
+            "heavy = ['src.benchmarking.benchmark_runner', 'src.navigation', 'playwright', 'pandas']\n"
+            "assert not [m for m in heavy if m in sys.modules]\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            text=True
+        )
+        
+        assert result.returncode == 0, result.stderr
 
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+"""
+Unit tests for Navigation Agent
+"""
+
+import asyncio
+import io
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from PIL import Image, ImageDraw
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from src.navigation import NavigationAgent, navigation_agent
+from src.navigation.navigation_agent import _block_heavy_requests
+
+
+class FakeNavigationAgent(NavigationAgent):
+    """Agent whose nodes skip the browser and VLM."""
+    
+    async def capture_screen_node(self, state):
+        return state
+    
+    async def analyze_elements_node(self, state):
+        return state
+    
+    async def reason_action_node(self, state):
+        state["reasoning"] = self.reasoning
+        return state
+    
+    async def execute_action_node(self, state):
+        state["step_count"] += 1
+        return state
+
+
+def initial_state(max_steps):
+    """Build a fresh navigation state."""
+    return {
+        "goal": "Find login",
+        "current_url": "https://example.com",
+        "screenshot_path": "",
+        "detected_elements": [],
+        "action_history": [],
+        "step_count": 0,
+        "max_steps": max_steps,
+        "completed": False,
+        "error": None,
+        "reasoning": ""
+    }
+
+
+async def run_workflow(agent, state):
+    """Run the agent's compiled workflow to completion."""
+    final_state = None
+    config = {"configurable": {"agent": agent}}
+    async for final_state in agent.app.astream(state, config, stream_mode="values"):
+        pass
+    return final_state
+
+
+class TestNavigationAgent:
+    """Test cases for NavigationAgent."""
+    
+    def test_workflow_is_compiled_once(self, mock_env):
+        """Test that agents share one compiled workflow."""
+        first = NavigationAgent(headless=True)
+        second = NavigationAgent(headless=True)
+        
+        assert first.app is second.app
+    
+    def test_shared_workflow_runs_each_agent(self, mock_env):
+        """Test that the shared workflow dispatches to the calling agent."""
+        first = FakeNavigationAgent(headless=True, max_steps=3)
+        first.reasoning = "first"
+        second = FakeNavigationAgent(headless=True, max_steps=2)
+        second.reasoning = "second"
+        
+        result_first = asyncio.run(run_workflow(first, initial_state(3)))
+        result_second = asyncio.run(run_workflow(second, initial_state(2)))
+        
+        assert result_first["step_count"] == 3
+        assert result_first["reasoning"] == "first"
+        assert result_second["step_count"] == 2
+        assert result_second["reasoning"] == "second"
+    
+    def test_navigate_closes_vlm_client_after_last_run(self, mock_env):
+        """Test that the async VLM client is closed after a run, or on exit of async with."""
+        async def run():
+            agent = FakeNavigationAgent(headless=True, max_steps=1)
+            agent.reasoning = ""
+            agent.initialize_browser = AsyncMock()
+            agent._ensure_browser = AsyncMock()
+            client = MagicMock(close=AsyncMock())
+            
+            agent.vision_engine._async_client = client
+            await agent.navigate("https://example.com", "Find login")
+            client.close.assert_awaited_once()
+            assert agent.vision_engine._async_client is None
+            
+            client = MagicMock(close=AsyncMock())
+            async with agent:
+                agent.vision_engine._async_client = client
+                await agent.navigate("https://example.com", "Find login")
+                client.close.assert_not_awaited()
+            client.close.assert_awaited_once()
+        
+        asyncio.run(run())
+    
+    @pytest.mark.parametrize("reasoning, completed", [
+        ("ELEMENT_INDEX: -1\nSTATUS: achieved\nREASONING: Done", True),
+        ("  STATUS: Failed.\nREASONING: Blocked at https://example.com", True),
+        ("ELEMENT_INDEX: none\nSTATUS: continue\nREASONING: Keep going", False),
+    ])
+    def test_execute_action_parses_reasoning(self, mock_env, reasoning, completed):
+        """Test parsing of the reasoning response fields."""
+        agent = NavigationAgent(headless=True)
+        state = initial_state(5)
+        state["reasoning"] = reasoning
+        
+        result = asyncio.run(agent.execute_action_node(state))
+        
+        assert result["completed"] is completed
+        assert result["error"] is None
+    
+    def test_click_waits_for_its_navigation_not_a_fixed_sleep(self, mock_env, sample_detected_elements):
+        """Test that a click waits on the navigation it starts, tolerating none."""
+        agent = NavigationAgent(headless=True, max_wait_ms=1500)
+        agent.page = MagicMock()
+        events = []
+        agent.page.mouse.click = AsyncMock(side_effect=lambda *args: events.append("click"))
+        agent.page.wait_for_timeout = AsyncMock()
+        navigation = agent.page.expect_navigation.return_value
+        navigation.__aenter__.side_effect = lambda *args: events.append("expect")
+        navigation.__aexit__.side_effect = PlaywrightTimeoutError("no navigation")
+        
+        state = initial_state(5)
+        state["detected_elements"] = sample_detected_elements
+        state["reasoning"] = "ELEMENT_INDEX: 0\nSTATUS: continue"
+        
+        result = asyncio.run(agent.execute_action_node(state))
+        
+        agent.page.expect_navigation.assert_called_once_with(wait_until="networkidle", timeout=1500)
+        assert events == ["expect", "click"]
+        agent.page.wait_for_timeout.assert_not_called()
+        assert result["error"] is None
+        assert result["action_history"][0]["action_type"] == "click"
+    
+    def test_reasoning_stream_stops_after_required_fields(self, mock_env):
+        """Test that the LLM stream is abandoned once both fields are parsed."""
+        chunks = ["ELEMENT_INDEX: 2\nSTA", "TUS: cont", "inue\n", "REASONING: long trailer"]
+        consumed = []
+        closed = []
+        
+        async def astream(messages):
+            try:
+                for text in chunks:
+                    consumed.append(text)
+                    yield MagicMock(content=text)
+            finally:
+                closed.append(True)
+        
+        agent = NavigationAgent(headless=True)
+        agent.llm = MagicMock(astream=astream)
+        
+        async def reason():
+            result = await agent.reason_action_node(initial_state(5))
+            # Closed by the node itself, not later by the loop's async-generator cleanup
+            assert closed == [True]
+            return result
+        
+        result = asyncio.run(reason())
+        
+        assert result["reasoning"] == "ELEMENT_INDEX: 2\nSTATUS: continue\n"
+        assert len(consumed) == 3
+    
+    @pytest.mark.parametrize("url, resource_type, blocked", [
+        ("https://example.com/logo.png", "image", True),
+        ("https://example.com/font.woff2", "font", True),
+        ("https://stats.g.doubleclick.net/collect", "xhr", True),
+        ("https://example.com/app.js", "script", False),
+        ("https://example.com/", "document", False),
+    ])
+    def test_block_heavy_requests(self, url, resource_type, blocked):
+        """Test which requests are aborted when images are disabled."""
+        route = MagicMock(abort=AsyncMock(), continue_=AsyncMock())
+        route.request.url = url
+        route.request.resource_type = resource_type
+        
+        asyncio.run(_block_heavy_requests(route))
+        
+        assert route.abort.await_count == int(blocked)
+        assert route.continue_.await_count == int(not blocked)
+    
+    @pytest.mark.skipif(navigation_agent.imagehash is None, reason="imagehash not installed")
+    def test_near_identical_screenshots_reuse_analysis(self, mock_env, tmp_path, sample_detected_elements):
+        """Test that re-encoded copies of a page hit the perceptual-hash cache."""
+        image = Image.new("RGB", (1280, 720), "white")
+        ImageDraw.Draw(image).rectangle((100, 100, 600, 400), fill="blue")
+        image.save(tmp_path / "low.jpg", quality=60)
+        image.save(tmp_path / "high.jpg", quality=95)
+        
+        agent = NavigationAgent(headless=True)
+        agent.vision_engine.analyze_screenshot_bytes = AsyncMock(return_value=sample_detected_elements)
+        
+        async def analyze_both():
+            low = (tmp_path / "low.jpg").read_bytes()
+            high = (tmp_path / "high.jpg").read_bytes()
+            first = await agent._analyze_screenshot(low, "https://example.com/", "Find login", "Step 0/5")
+            second = await agent._analyze_screenshot(high, "https://example.com/", "Find login", "Step 1/5")
+            return first, second
+        
+        first, second = asyncio.run(analyze_both())
+        
+        assert second == first
+        agent.vision_engine.analyze_screenshot_bytes.assert_awaited_once()
+    
+    def test_analysis_cache_is_keyed_by_url_and_exact_bytes(self, mock_env, monkeypatch, sample_detected_elements):
+        """Test that the cache only hits for the same page and, without imagehash, the same bytes."""
+        monkeypatch.setattr(navigation_agent, "imagehash", None)
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), "white").save(buffer, format="PNG")
+        shot = buffer.getvalue()
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), (254, 254, 254)).save(buffer, format="PNG")
+        near_copy = buffer.getvalue()
+        
+        agent = NavigationAgent(headless=True)
+        analyze = agent.vision_engine.analyze_screenshot_bytes = AsyncMock(return_value=sample_detected_elements)
+        
+        async def analyze_all():
+            await agent._analyze_screenshot(shot, "https://example.com/?page=1", "Find login", "")
+            await agent._analyze_screenshot(shot, "https://example.com/?page=1", "Find login", "")
+            await agent._analyze_screenshot(shot, "https://example.com/?page=2", "Find login", "")
+            await agent._analyze_screenshot(near_copy, "https://example.com/?page=1", "Find login", "")
+        
+        asyncio.run(analyze_all())
+        
+        assert analyze.await_count == 3
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -7,10 +7,15 @@ from src.utils import (
     format_duration,
     truncate_text,
     setup_directories,
-    validate_api_keys
+    validate_api_keys,
+    load_config,
+    reload_config,
+    run_async
 )
 from pathlib import Path
+import asyncio
 import os
+from types import SimpleNamespace
 from unittest.mock import patch
 
 
@@ -59,6 +64,11 @@ class TestUtilityFunctions:
             assert (tmp_path / "data").exists()
             assert (tmp_path / "benchmarks").exists()
             assert (tmp_path / "logs").exists()
+            
+            # A directory removed while running comes back on the next call
+            (tmp_path / "screenshots").rmdir()
+            setup_directories()
+            assert (tmp_path / "screenshots").exists()
         finally:
             os.chdir(original_dir)
     
@@ -71,6 +81,35 @@ class TestUtilityFunctions:
             result = validate_api_keys()
             assert result['openai'] is True
             assert result['google'] is False
+    
+    def test_load_config_is_cached_until_reload(self):
+        """Test that config is read once and refreshed by reload_config."""
+        with patch.dict(os.environ, {'VLM_MODEL': 'first-model'}):
+            assert load_config()["vlm_model"] == "first-model"
+        
+        with patch.dict(os.environ, {'VLM_MODEL': 'second-model'}):
+            assert load_config()["vlm_model"] == "first-model"
+            assert reload_config()["vlm_model"] == "second-model"
+    
+    def test_load_config_returns_a_copy(self):
+        """Test that one caller's edits do not leak into later calls."""
+        load_config()["vlm_model"] = "mutated"
+        assert load_config()["vlm_model"] != "mutated"
+    
+    def test_run_async_uses_uvloop_without_touching_the_policy(self):
+        """Test that run_async runs on uvloop.run and leaves the global policy alone."""
+        async def answer():
+            return 42
+        
+        calls = []
+        fake_uvloop = SimpleNamespace(run=lambda coro: calls.append(coro) or asyncio.run(coro))
+        policy = asyncio.get_event_loop_policy()
+        with patch.dict("sys.modules", {"uvloop": fake_uvloop}):
+            assert run_async(answer()) == 42
+        assert len(calls) == 1
+        with patch.dict("sys.modules", {"uvloop": None}):
+            assert run_async(answer()) == 42
+        assert asyncio.get_event_loop_policy() is policy
 
 
 if __name__ == "__main__":
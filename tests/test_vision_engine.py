@@ -2,10 +2,16 @@
 Unit tests for Vision Engine
 """
 
+import asyncio
+import dataclasses
+import io
+import os
 import pytest
 from pathlib import Path
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
+from PIL import Image
 from src.vision_engine import VisionEngine, DetectedElement
+from src.vision_engine import vision_engine as vision_engine_module
 
 
 class TestVisionEngine:
@@ -19,6 +25,20 @@ class TestVisionEngine:
                 assert engine.provider == "openai"
                 assert engine.model == "gpt-4o"
     
+    def test_openai_clients_use_pooled_http2(self):
+        """Test that the OpenAI clients get a keep-alive, HTTP/2 httpx pool."""
+        pytest.importorskip("h2")
+        with patch('openai.OpenAI', create=True), patch('openai.AsyncOpenAI', create=True):
+            with patch('openai.DefaultHttpxClient') as sync_pool, patch('openai.DefaultAsyncHttpxClient') as async_pool:
+                with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                    engine = VisionEngine()
+                    engine._get_async_client()
+                    
+                    for pool in (sync_pool, async_pool):
+                        options = pool.call_args.kwargs
+                        assert options["http2"] is True
+                        assert options["limits"].max_keepalive_connections == 32
+    
     def test_init_google(self):
         """Test initialization with Google provider."""
         with patch('google.generativeai.configure', create=True):
@@ -46,6 +66,20 @@ class TestVisionEngine:
                 assert x == 125
                 assert y == 215
     
+    def test_calculate_click_coordinates_batch(self):
+        """Test that the batch centers match the per-element calculation."""
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                boxes = [(100, 200, 50, 30), (0, 0, 7, 9), (10, 20, 1, 1)]
+                
+                centers = engine.calculate_click_coordinates_batch(boxes)
+                
+                assert centers.tolist() == [
+                    list(engine.calculate_click_coordinates(box)) for box in boxes
+                ]
+                assert engine.calculate_click_coordinates_batch([]).shape == (0, 2)
+    
     def test_build_analysis_prompt(self):
         """Test prompt building."""
         with patch('openai.OpenAI', create=True):
@@ -61,6 +95,317 @@ class TestVisionEngine:
                 assert "Homepage" in prompt
                 assert "JSON" in prompt
     
+    @pytest.mark.parametrize("content, expected", [
+        ('[{"element_type": "button"}]', [{"element_type": "button"}]),
+        ('Found these:\n```json\n[{"description": "Go [next]"}]\n```', [{"description": "Go [next]"}]),
+        ('See [1] below.\n[{"description": "say \\"]\\" please"}]', [{"description": 'say "]" please'}]),
+        ('{"elements": [{"element_type": "link"}]}', [{"element_type": "link"}]),
+        ('No elements [here', []),
+    ])
+    def test_extract_json(self, content, expected):
+        """Test locating the element array in free-form VLM output."""
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                
+                assert engine._extract_json(content) == expected
+    
+    @pytest.mark.parametrize("api_url, structured", [
+        (None, True),
+        ("http://localhost:8000/v1", False),
+    ])
+    def test_openai_request_uses_structured_output(self, tmp_path, api_url, structured):
+        """Test that strict JSON output is requested only from OpenAI itself."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (640, 360)).save(screenshot)
+        env = {'OPENAI_API_KEY': 'test-key', 'VLM_API_URL': api_url or ''}
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', env):
+                engine = VisionEngine()
+                
+                request, _ = engine._build_openai_request(str(screenshot), "Find login")
+                
+                assert ("response_format" in request) is structured
+                if structured:
+                    response_format = request["response_format"]
+                    assert response_format["type"] == "json_schema"
+                    assert response_format["json_schema"]["strict"] is True
+                    assert response_format["json_schema"]["schema"]["required"] == ["elements"]
+    
+    def test_analyze_screenshot_uses_cache(self, tmp_path, sample_detected_elements):
+        """Test that repeated analysis of the same screenshot hits the cache."""
+        screenshot = tmp_path / "shot.png"
+        screenshot.write_bytes(b"fake image bytes")
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine(cache_dir=str(tmp_path / "cache"))
+                
+                with patch.object(
+                    engine, '_analyze_with_openai', return_value=sample_detected_elements
+                ) as mock_analyze:
+                    first = engine.analyze_screenshot(str(screenshot), "Find login")
+                    second = engine.analyze_screenshot(str(screenshot), "Find login")
+                
+                assert mock_analyze.call_count == 1
+                assert second == first
+    
+    def test_openai_token_usage_is_recorded(self, tmp_path):
+        """Test that provider-reported token usage is accumulated."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (640, 360)).save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                engine.client = MagicMock()
+                engine.client.chat.completions.create.return_value = Mock(
+                    choices=[Mock(message=Mock(content="[]"))],
+                    usage=Mock(prompt_tokens=1200, completion_tokens=80)
+                )
+                
+                engine.analyze_screenshot(str(screenshot), "Find login")
+                engine.analyze_screenshot(str(screenshot), "Find login")
+                
+                assert engine.token_usage == {"prompt": 2400, "completion": 160}
+    
+    def test_downscaled_boxes_map_to_screenshot_pixels(self, tmp_path):
+        """Test that boxes from a downscaled upload are scaled back."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (2048, 1024)).save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine(max_image_dim=1024)
+                engine.client = MagicMock()
+                engine.client.chat.completions.create.return_value = Mock(
+                    choices=[Mock(message=Mock(
+                        content='[{"element_type": "button", "bounding_box": [100, 50, 40, 20]}]'
+                    ))],
+                    usage=None
+                )
+                
+                elements = engine.analyze_screenshot(str(screenshot), "Find login")
+                
+                assert elements[0].bounding_box == (200, 100, 80, 40)
+    
+    def test_low_detail_caps_upload_size(self, tmp_path):
+        """Test that low detail uploads at most 512px and requests detail=low."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (2048, 1024)).save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine(image_detail="low")
+                
+                request, scale = engine._build_openai_request(str(screenshot), "Find login")
+                image, _ = engine._load_scaled_image(str(screenshot))
+                
+                assert scale == 0.25
+                assert image.size == (512, 256)
+                assert request["messages"][0]["content"][1]["image_url"]["detail"] == "low"
+    
+    def test_encode_image_is_cached_per_file_version(self, tmp_path):
+        """Test that re-encoding is skipped until the file changes."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (640, 360), "red").save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                
+                with patch.object(engine, '_encode_jpeg', wraps=engine._encode_jpeg) as mock_encode:
+                    first = engine.encode_image(str(screenshot))
+                    assert engine.encode_image(str(screenshot)) == first
+                    assert mock_encode.call_count == 1
+                    
+                    Image.new("RGB", (640, 360), "blue").save(screenshot)
+                    os.utime(screenshot, ns=(0, screenshot.stat().st_mtime_ns + 1))
+                    assert engine.encode_image(str(screenshot)) != first
+                    assert mock_encode.call_count == 2
+    
+    @pytest.mark.parametrize("use_cv2", [True, False])
+    def test_encode_jpeg_backends_agree(self, tmp_path, use_cv2):
+        """Test that the OpenCV and PIL encoders downscale the same way."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (1920, 1080), "red").save(screenshot)
+        
+        if use_cv2:
+            pytest.importorskip("cv2")
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine(max_image_dim=960)
+                
+                with patch.object(vision_engine_module, 'cv2', vision_engine_module.cv2 if use_cv2 else None):
+                    jpeg, scale = engine._encode_jpeg(screenshot.read_bytes())
+                
+                assert scale == 0.5
+                assert Image.open(io.BytesIO(jpeg)).size == (960, 540)
+    
+    @pytest.mark.parametrize("use_cv2", [True, False])
+    def test_draw_bounding_boxes(self, tmp_path, sample_detected_elements, use_cv2):
+        """Test annotating a screenshot with either drawing backend."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (400, 300), "white").save(screenshot)
+        output = tmp_path / "annotated.png"
+        
+        if use_cv2:
+            pytest.importorskip("cv2")
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                
+                with patch.object(vision_engine_module, 'cv2', vision_engine_module.cv2 if use_cv2 else None):
+                    result = engine.draw_bounding_boxes(str(screenshot), sample_detected_elements, str(output))
+                
+                assert result == str(output)
+                annotated = Image.open(output).convert("RGB")
+                assert annotated.size == (400, 300)
+                # Top-left corner of the first (high-confidence) box is red
+                x, y, _, _ = sample_detected_elements[0].bounding_box
+                assert annotated.getpixel((x, y)) == (255, 0, 0)
+    
+    def test_float_boxes_are_drawn_with_cv2(self, tmp_path, sample_detected_elements):
+        """Test that float VLM coordinates become ints before reaching OpenCV."""
+        pytest.importorskip("cv2")
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (400, 300), "white").save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                
+                box = engine._scale_box([100.4, 200.6, 80.0, 40.2], 1.0)
+                assert box == (100, 201, 80, 40)
+                assert all(type(v) is int for v in box)
+                
+                elements = [dataclasses.replace(sample_detected_elements[0], bounding_box=(100.4, 200.6, 80.0, 40.2))]
+                jpeg = engine.annotate_bytes(str(screenshot), elements)
+                
+                annotated = Image.open(io.BytesIO(jpeg)).convert("RGB")
+                r, g, b = annotated.getpixel((101, 202))
+                assert r > 200 and g < 80 and b < 80
+    
+    @pytest.mark.parametrize("use_cv2", [True, False])
+    def test_annotate_bytes(self, tmp_path, sample_detected_elements, use_cv2):
+        """Test annotating a screenshot straight to JPEG bytes."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (400, 300), "white").save(screenshot)
+        
+        if use_cv2:
+            pytest.importorskip("cv2")
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                
+                with patch.object(vision_engine_module, 'cv2', vision_engine_module.cv2 if use_cv2 else None):
+                    jpeg = engine.annotate_bytes(str(screenshot), sample_detected_elements)
+                
+                annotated = Image.open(io.BytesIO(jpeg))
+                assert annotated.format == "JPEG"
+                assert annotated.size == (400, 300)
+                assert list(tmp_path.iterdir()) == [screenshot]
+                # JPEG is lossy: the box edge is only approximately red
+                x, y, _, _ = sample_detected_elements[0].bounding_box
+                r, g, b = annotated.convert("RGB").getpixel((x + 1, y + 1))
+                assert r > 200 and g < 80 and b < 80
+    
+    def test_load_scaled_image_with_cv2_keeps_colors(self, tmp_path):
+        """Test that the OpenCV resize hands Gemini an RGB PIL image."""
+        pytest.importorskip("cv2")
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (2000, 1000), (255, 0, 0)).save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine(max_image_dim=1000)
+                
+                image, scale = engine._load_scaled_image(str(screenshot))
+                
+                assert scale == 0.5
+                assert image.size == (1000, 500)
+                assert image.getpixel((10, 10)) == (255, 0, 0)
+    
+    def test_analyze_screenshot_async_uses_async_client(self, tmp_path):
+        """Test the async analysis path against the AsyncOpenAI client."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (640, 360)).save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                engine._async_client = MagicMock()
+                engine._async_client.chat.completions.create = AsyncMock(return_value=Mock(
+                    choices=[Mock(message=Mock(
+                        content='[{"element_type": "link", "bounding_box": [1, 2, 3, 4]}]'
+                    ))],
+                    usage=Mock(prompt_tokens=10, completion_tokens=5)
+                ))
+                
+                elements = asyncio.run(
+                    engine.analyze_screenshot_async(str(screenshot), "Find login")
+                )
+                
+                assert elements[0].element_type == "link"
+                assert elements[0].bounding_box == (1, 2, 3, 4)
+                assert engine.token_usage == {"prompt": 10, "completion": 5}
+                engine.client.chat.completions.create.assert_not_called()
+    
+    def test_screenshot_bytes_share_cache_with_file(self, tmp_path, sample_detected_elements):
+        """Test that in-memory screenshots are analyzed and cached like files."""
+        screenshot = tmp_path / "shot.png"
+        Image.new("RGB", (640, 360)).save(screenshot)
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine(cache_dir=str(tmp_path / "cache"))
+                
+                with patch.object(
+                    engine, '_analyze_with_openai_async', AsyncMock(return_value=sample_detected_elements)
+                ) as mock_analyze:
+                    first = asyncio.run(
+                        engine.analyze_screenshot_bytes(screenshot.read_bytes(), "Find login")
+                    )
+                    second = asyncio.run(
+                        engine.analyze_screenshot_async(str(screenshot), "Find login")
+                    )
+                
+                assert mock_analyze.await_count == 1
+                assert second == first
+    
+    def test_analyze_screenshots_batch(self, sample_detected_elements):
+        """Test bounded fan-out with results mapped back to input order."""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_analyze(path, goal, context):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if path == "bad.png":
+                raise RuntimeError("boom")
+            return sample_detected_elements[:int(path[0])]
+        
+        with patch('openai.OpenAI', create=True):
+            with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}):
+                engine = VisionEngine()
+                
+                with patch.object(engine, '_analyze_async', side_effect=fake_analyze):
+                    results = engine.analyze_screenshots_batch(
+                        ["2.png", "bad.png", "1.png", "0.png"],
+                        ["Find login"] * 4,
+                        max_concurrency=2
+                    )
+                
+                assert [len(r) for r in results] == [2, 0, 1, 0]
+                assert peak == 2
+    
     def test_detected_element_creation(self):
         """Test DetectedElement dataclass."""
         element = DetectedElement(
@@ -94,6 +439,15 @@ class TestDetectedElement:
         assert elem.element_type == "link"
         assert elem.description == "Contact page"
         assert elem.bounding_box == (50, 60, 100, 20)
+    
+    def test_element_is_frozen_and_hashable(self, sample_detected_elements):
+        """Test that elements are immutable, slotted and usable as keys."""
+        elem = sample_detected_elements[0]
+        
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            elem.center = (1, 2)
+        assert not hasattr(elem, "__dict__")
+        assert len({elem, dataclasses.replace(elem)}) == 1
 
 
 if __name__ == "__main__":